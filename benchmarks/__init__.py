@@ -0,0 +1,5 @@
+"""Benchmarks for tsgen, run as modules, e.g. `python -m benchmarks.codec_bench`
+
+Every benchmark writes its results as json (see `benchmarks.results`), which can be
+compared between commits using `python -m benchmarks.compare <baseline.json> <new.json>`.
+"""
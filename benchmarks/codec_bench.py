@@ -0,0 +1,189 @@
+"""Throughput and allocation benchmarks of dto conversion for each node type
+
+Usage: `python -m benchmarks.codec_bench [--quick] [--filter <substring>] [--output results.json]`
+
+Each case is a synthetic python type and value, varying in size (number of items),
+width (fields per object) and depth (nesting of objects). Every case is converted
+
+* `parse_dto` from its dto to python values
+* `create_dto` from python values to its dto
+* `write_json` from python values directly to a json string
+
+both using the node api (`impl: "tree"`) and the compiled codecs (`impl: "compiled"`,
+see `tsgen.types.codec`). Timings are the best of several repeats, and allocations
+are the peak memory traced during a single conversion.
+
+Values are generated from a fixed seed, so runs on the same commit convert
+identical data. Note that repeated datetime parsing hits the parse cache of
+`tsgen.types.dates`, so those results show steady state performance.
+"""
+import argparse
+import dataclasses
+import datetime
+import random
+import timeit
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from benchmarks.results import write_results
+from tsgen.types import get_type_tree, AbstractNode
+from tsgen.types.codec import compile_parse_dto, compile_create_dto, compile_write_json
+
+SIZES = (10, 1000, 10000)
+QUICK_SIZES = (10, 100)
+WIDTHS = (2, 10, 50)
+DEPTHS = (1, 4, 16)
+
+
+@dataclass
+class Case:
+    name: str
+    node: str  # the node type mainly exercised by the case
+    py_type: Any
+    value: Any
+    items: int  # number of values converted, for throughput
+
+
+def _object_type(width: int, name: str = "Wide") -> type:
+    field_types = [int, str, float]
+    return dataclasses.make_dataclass(
+        f"{name}{width}",
+        [(f"field_{i}", field_types[i % len(field_types)]) for i in range(width)]
+    )
+
+
+def _object_value(cls: type, rng: random.Random) -> Any:
+    values = {int: lambda: rng.randrange(10 ** 6), str: lambda: f"value {rng.random()}", float: rng.random}
+    return cls(**{f.name: values[f.type]() for f in dataclasses.fields(cls)})
+
+
+def _nested_type(depth: int) -> type:
+    cls = dataclasses.make_dataclass("Leaf", [("value", int)])
+    for level in range(depth):
+        cls = dataclasses.make_dataclass(f"Level{level}", [("value", int), ("child", cls)])
+    return cls
+
+
+def _nested_value(cls: type, rng: random.Random) -> Any:
+    fields = {f.name: f.type for f in dataclasses.fields(cls)}
+    if "child" in fields:
+        return cls(value=rng.randrange(10 ** 6), child=_nested_value(fields["child"], rng))
+    return cls(value=rng.randrange(10 ** 6))
+
+
+def build_cases(sizes: tuple[int, ...], seed: int = 0) -> list[Case]:
+    rng = random.Random(seed)
+    epoch = datetime.datetime(2020, 1, 1)
+    cases = [
+        Case("int", "Primitive", int, 123456, 1),
+        Case("str", "Primitive", str, "hello world", 1),
+    ]
+    for n in sizes:
+        cases += [
+            Case(f"list[int] n={n}", "List", list[int], [rng.randrange(10 ** 6) for _ in range(n)], n),
+            Case(f"list[str] n={n}", "List", list[str], [f"item {i}" for i in range(n)], n),
+            Case(f"dict[str,int] n={n}", "Dict", dict[str, int], {f"key {i}": i for i in range(n)}, n),
+            Case(
+                f"list[tuple[int,str,float]] n={n}", "Tuple", list[tuple[int, str, float]],
+                [(i, f"item {i}", rng.random()) for i in range(n)], n
+            ),
+            Case(
+                f"list[Optional[int]] n={n}", "Nullable", list[Optional[int]],
+                [i if i % 2 else None for i in range(n)], n
+            ),
+            Case(
+                f"list[datetime] n={n}", "DateTime", list[datetime.datetime],
+                [epoch + datetime.timedelta(seconds=rng.randrange(10 ** 8)) for _ in range(n)], n
+            ),
+            Case(
+                f"list[date] n={n}", "Date", list[datetime.date],
+                [epoch.date() + datetime.timedelta(days=rng.randrange(10 ** 4)) for _ in range(n)], n
+            ),
+        ]
+    for width in WIDTHS:
+        cls = _object_type(width)
+        cases.append(Case(f"object width={width}", "Object", cls, _object_value(cls, rng), width))
+        for n in sizes:
+            cases.append(Case(
+                f"list[object] width={width} n={n}", "Object", list[cls],
+                [_object_value(cls, rng) for _ in range(n)], width * n
+            ))
+    for depth in DEPTHS:
+        cls = _nested_type(depth)
+        cases.append(Case(f"object depth={depth}", "Object", cls, _nested_value(cls, rng), depth + 1))
+    return cases
+
+
+def _measure(func: Callable[[Any], Any], arg: Any, repeat: int, min_time: float) -> dict:
+    timer = timeit.Timer(lambda: func(arg))
+    number = 1
+    while (elapsed := timer.timeit(number)) < min_time:
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    seconds = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    tracemalloc.start()
+    try:
+        func(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": seconds, "peak_alloc_bytes": peak}
+
+
+def _conversions(node: AbstractNode) -> list[tuple[str, str, Callable[[Any], Any], bool]]:
+    """(op, impl, function, takes_dto)"""
+    return [
+        ("parse_dto", "tree", node.parse_dto, True),
+        ("parse_dto", "compiled", compile_parse_dto(node), True),
+        ("create_dto", "tree", node.create_dto, False),
+        ("create_dto", "compiled", compile_create_dto(node), False),
+        ("write_json", "compiled", compile_write_json(node), False),
+    ]
+
+
+def run(cases: list[Case], repeat: int = 5, min_time: float = 0.1, name_filter: Optional[str] = None) -> list[dict]:
+    """Measure all conversions of the cases
+
+    :param repeat: Number of timings of each measurement, the best of which is used
+    :param min_time: Minimum seconds per timing, calls are repeated until this is reached
+    """
+    results = []
+    for case in cases:
+        node = get_type_tree(case.py_type)
+        dto = node.create_dto(case.value)
+        for op, impl, func, takes_dto in _conversions(node):
+            name = f"{case.name}/{op}/{impl}"
+            if name_filter and name_filter not in name:
+                continue
+            measurement = _measure(func, dto if takes_dto else case.value, repeat, min_time)
+            results.append({
+                "name": name,
+                "case": case.name,
+                "node": case.node,
+                "op": op,
+                "impl": impl,
+                "items": case.items,
+                **measurement,
+                "items_per_second": case.items / measurement["seconds"],
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--quick", action="store_true", help=f"Only use sizes {QUICK_SIZES} and shorter timings")
+    parser.add_argument("--filter", default=None, help="Only run measurements with names containing this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Result file, defaults to stdout")
+    args = parser.parse_args()
+
+    cases = build_cases(QUICK_SIZES if args.quick else SIZES, seed=args.seed)
+    min_time = 0.01 if args.quick else 0.1
+    results = run(cases, repeat=args.repeat, min_time=min_time, name_filter=args.filter)
+    write_results("codec", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+from benchmarks.codec_bench import build_cases, run
+
+
+def test_run_all_cases():
+    cases = build_cases((3,))
+    assert {case.node for case in cases} == {
+        "Primitive", "List", "Dict", "Tuple", "Nullable", "Object", "DateTime", "Date"
+    }
+    results = run(cases, repeat=1, min_time=0)
+    assert len(results) == 5 * len(cases)
+    assert len({result["name"] for result in results}) == len(results)
+    assert all(result["seconds"] > 0 and result["peak_alloc_bytes"] >= 0 for result in results)
+
+
+def test_filter():
+    results = run(build_cases((3,)), repeat=1, min_time=0, name_filter="list[int] n=3/parse_dto/")
+    assert [result["name"] for result in results] == [
+        "list[int] n=3/parse_dto/tree",
+        "list[int] n=3/parse_dto/compiled",
+    ]
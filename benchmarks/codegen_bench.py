@@ -0,0 +1,209 @@
+"""Scaling benchmark of typescript code generation for large synthetic apps
+
+Usage: `python -m benchmarks.codegen_bench [--scales 1,2,4,8] [--endpoints 100] [--output results.json]`
+
+For every scale factor, a flask app is synthesized with `endpoints * scale` typed routes
+spread over a number of python modules, using `dataclasses * scale` dataclasses in
+nesting chains of configurable depth. A fraction of the routes use dataclasses shared
+between all modules, the rest only use dataclasses local to their module.
+
+The stages of a build are measured separately:
+
+* `decorate` applying `typed()` to all views (type trees and codec compilation, never deferred here)
+* `build_ts_api` resolving the routes of all typed views into endpoints
+* `get_files` generating the client code of all endpoints and rendering the typescript files
+* `save_to_disk` fingerprinting the modules and writing the files generated by `get_files`
+
+Wall time is measured in one pass and peak traced memory in another, since tracing
+slows down the code it measures. For each stage, a `scaling/<stage>` result holds the
+exponent `k` of the fitted `time ~ size^k` between the smallest and largest scale,
+i.e. ~1 for linear and ~2 for quadratic growth.
+"""
+import argparse
+import dataclasses
+import math
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import flask
+
+from benchmarks.results import write_results
+from tsgen.flask_integration import typed, build_ts_api
+
+STAGES = ("decorate", "build_ts_api", "get_files", "save_to_disk")
+
+
+@dataclass
+class AppShape:
+    endpoints: int = 100
+    dataclasses: int = 60
+    nesting: int = 3  # length of chains of dataclasses containing each other
+    shared_fraction: float = 0.2  # fraction of routes using dataclasses shared by all modules
+    modules: int = 10
+
+    def __post_init__(self):
+        if self.nesting < 1 or self.modules < 1 or self.dataclasses < 1:
+            raise ValueError(f"nesting, modules and dataclasses must be at least 1: {self}")
+
+    def scaled(self, scale: int) -> "AppShape":
+        return dataclasses.replace(
+            self, endpoints=self.endpoints * scale, dataclasses=self.dataclasses * scale, modules=self.modules * scale
+        )
+
+
+def _module_name(index: int) -> str:
+    return f"bench_app.module_{index}"
+
+
+def synthesize_models(shape: AppShape) -> tuple[list[type], dict[str, list[type]]]:
+    """Create dataclasses, returning shared ones and module local ones by module name"""
+    shared_count = max(1, int(shape.dataclasses * shape.shared_fraction))
+    shared: list[type] = []
+    local: dict[str, list[type]] = {_module_name(i): [] for i in range(shape.modules)}
+    previous: Optional[type] = None
+    for i in range(shape.dataclasses):
+        fields = [("id", int), ("name", str), ("score", Optional[float]), ("tags", list[str])]
+        if previous is not None and i % shape.nesting:
+            fields.append(("child", previous))
+        cls = dataclasses.make_dataclass(f"Model{i}", fields)
+        if i < shared_count:
+            cls.__module__ = "bench_app.shared"
+            shared.append(cls)
+        else:
+            cls.__module__ = _module_name(i % shape.modules)
+            local[cls.__module__].append(cls)
+        previous = cls
+    return shared, local
+
+
+def _view(name: str, module: str, annotations: dict) -> Callable:
+    def view(**kwargs):
+        return None
+
+    view.__name__ = view.__qualname__ = name
+    view.__module__ = module
+    view.__annotations__ = annotations
+    return view
+
+
+def synthesize_app(shape: AppShape) -> flask.Flask:
+    """Create an app with typed routes, taking and returning dataclasses and lists of them"""
+    shared, local = synthesize_models(shape)
+    app = flask.Flask("bench_app")
+    shared_every = round(1 / shape.shared_fraction) if shape.shared_fraction else 0
+    for i in range(shape.endpoints):
+        module = _module_name(i % shape.modules)
+        use_shared = (shared_every and i % shared_every == 0) or not local[module]
+        candidates = shared if use_shared else local[module]
+        model = candidates[i % len(candidates)]
+        if i % 2:
+            view = _view(f"create_item_{i}", module, {"item": model, "return": model})
+            app.add_url_rule(f"/api/items_{i}", f"create_item_{i}", typed(deferred=False)(view), methods=["POST"])
+        else:
+            view = _view(f"list_items_{i}", module, {"return": list[model]})
+            app.add_url_rule(f"/api/items_{i}/<category>", f"list_items_{i}", typed(deferred=False)(view))
+    return app
+
+
+def run_stages(shape: AppShape, stage_hook: Callable[[str], None]) -> int:
+    """Run all stages of a build, calling `stage_hook` with the name of each stage when it's done
+
+    :return: Number of files generated
+    """
+    app = synthesize_app(shape)
+    stage_hook("decorate")
+    client_builder = build_ts_api(app)
+    stage_hook("build_ts_api")
+    files = client_builder.get_files()  # client code is generated lazily, on the first request for the files
+    stage_hook("get_files")
+    with tempfile.TemporaryDirectory() as output_dir:
+        client_builder.save_to_disk(output_dir)
+        stage_hook("save_to_disk")
+    return len(files)
+
+
+def measure(shape: AppShape) -> dict[str, dict[str, float]]:
+    """{stage: {"seconds": ..., "peak_memory_bytes": ...}}"""
+    stats: dict[str, dict[str, float]] = {}
+
+    last = time.perf_counter()
+
+    def time_stage(stage: str):
+        nonlocal last
+        now = time.perf_counter()
+        stats[stage] = {"seconds": now - last}
+        last = now
+
+    run_stages(shape, time_stage)
+
+    def trace_stage(stage: str):
+        _, peak = tracemalloc.get_traced_memory()
+        stats[stage]["peak_memory_bytes"] = peak
+        tracemalloc.reset_peak()
+
+    tracemalloc.start()
+    try:
+        run_stages(shape, trace_stage)
+    finally:
+        tracemalloc.stop()
+    stats["total"] = {
+        "seconds": sum(stats[stage]["seconds"] for stage in STAGES),
+        "peak_memory_bytes": max(stats[stage]["peak_memory_bytes"] for stage in STAGES),
+    }
+    return stats
+
+
+def scaling_exponent(sizes: list[int], seconds: list[float]) -> Optional[float]:
+    """Exponent k of `seconds ~ size^k` between the smallest and largest size"""
+    if len(sizes) < 2 or min(seconds) <= 0:
+        return None
+    return math.log(seconds[-1] / seconds[0]) / math.log(sizes[-1] / sizes[0])
+
+
+def run(base: AppShape, scales: list[int]) -> list[dict]:
+    results = []
+    stage_seconds: dict[str, list[float]] = {stage: [] for stage in (*STAGES, "total")}
+    for scale in scales:
+        shape = base.scaled(scale)
+        for stage, stats in measure(shape).items():
+            stage_seconds[stage].append(stats["seconds"])
+            results.append({
+                "name": f"endpoints={shape.endpoints}/{stage}",
+                "stage": stage,
+                **dataclasses.asdict(shape),
+                **stats,
+            })
+    for stage, seconds in stage_seconds.items():
+        results.append({
+            "name": f"scaling/{stage}",
+            "stage": stage,
+            "exponent": scaling_exponent([base.scaled(scale).endpoints for scale in scales], seconds),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    defaults = AppShape()
+    parser.add_argument("--scales", default="1,2,4,8", help="Comma separated app size multipliers")
+    parser.add_argument("--endpoints", type=int, default=defaults.endpoints)
+    parser.add_argument("--dataclasses", type=int, default=defaults.dataclasses)
+    parser.add_argument("--nesting", type=int, default=defaults.nesting)
+    parser.add_argument("--shared-fraction", type=float, default=defaults.shared_fraction)
+    parser.add_argument("--modules", type=int, default=defaults.modules)
+    parser.add_argument("--output", default=None, help="Result file, defaults to stdout")
+    args = parser.parse_args()
+
+    try:
+        base = AppShape(args.endpoints, args.dataclasses, args.nesting, args.shared_fraction, args.modules)
+    except ValueError as e:
+        parser.error(str(e))
+    scales = sorted(int(scale) for scale in args.scales.split(","))
+    write_results("codegen", run(base, scales), args.output)
+
+
+if __name__ == "__main__":
+    main()
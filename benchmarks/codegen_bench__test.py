@@ -0,0 +1,29 @@
+import pytest
+
+from benchmarks.codegen_bench import AppShape, run, run_stages, scaling_exponent, STAGES
+
+
+def test_run_stages():
+    stages = []
+    file_count = run_stages(AppShape(endpoints=12, dataclasses=8, modules=3), stages.append)
+    assert stages == list(STAGES)
+    assert file_count == 3
+
+
+def test_run():
+    results = run(AppShape(endpoints=4, dataclasses=4, modules=2), [1, 2])
+    names = [result["name"] for result in results]
+    assert "endpoints=8/build_ts_api" in names
+    assert "scaling/total" in names
+    assert all(result["peak_memory_bytes"] > 0 for result in results if "seconds" in result)
+
+
+def test_scaling_exponent():
+    assert scaling_exponent([10, 100], [1.0, 10.0]) == 1.0
+    assert scaling_exponent([10, 100], [1.0, 100.0]) == 2.0
+    assert scaling_exponent([10], [1.0]) is None
+
+
+def test_invalid_shape():
+    with pytest.raises(ValueError):
+        AppShape(nesting=0)
@@ -0,0 +1,56 @@
+"""Compare two benchmark result files, e.g. from the main branch and a change
+
+Usage: `python -m benchmarks.compare <baseline.json> <new.json> [--metric seconds] [--threshold 0.1]`
+
+Prints the relative change of a metric for every measurement present in both files,
+and exits with status 1 if any of them got worse by more than the threshold, so it can
+be used to catch regressions in CI. Lower is better for all metrics except the ones
+in `HIGHER_IS_BETTER`, like throughputs.
+"""
+import argparse
+import sys
+
+from benchmarks.results import load_results
+
+HIGHER_IS_BETTER = {"requests_per_second", "items_per_second", "throughput_ratio"}
+
+
+def worsening(metric: str, change: float) -> float:
+    """Relative change of a metric in the direction that is worse"""
+    return -change if metric in HIGHER_IS_BETTER else change
+
+
+def compare(baseline: dict[str, dict], new: dict[str, dict], metric: str) -> list[tuple[str, float, float, float]]:
+    """(name, baseline value, new value, relative change) for measurements in both result sets"""
+    rows = []
+    for name, result in new.items():
+        if name not in baseline or metric not in result or metric not in baseline[name]:
+            continue
+        old_value, new_value = baseline[name][metric], result[metric]
+        change = (new_value - old_value) / old_value if old_value else 0.0
+        rows.append((name, old_value, new_value, change))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("baseline")
+    parser.add_argument("new")
+    parser.add_argument("--metric", default="seconds")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Allowed relative worsening of the metric")
+    args = parser.parse_args()
+
+    rows = compare(load_results(args.baseline), load_results(args.new), args.metric)
+    regressions = 0
+    for name, old_value, new_value, change in sorted(rows, key=lambda row: -worsening(args.metric, row[3])):
+        flag = ""
+        if worsening(args.metric, change) > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{name:<70} {old_value:>12.6g} {new_value:>12.6g} {change:>+8.1%}{flag}")
+    print(f"{len(rows)} compared, {regressions} regressions above {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
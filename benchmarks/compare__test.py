@@ -0,0 +1,13 @@
+from benchmarks.compare import compare, worsening
+
+
+def test_compare():
+    baseline = {"a": {"seconds": 1.0}, "b": {"seconds": 2.0}, "removed": {"seconds": 1.0}}
+    new = {"a": {"seconds": 1.5}, "b": {"seconds": 1.0}, "added": {"seconds": 1.0}}
+    assert compare(baseline, new, "seconds") == [("a", 1.0, 1.5, 0.5), ("b", 2.0, 1.0, -0.5)]
+
+
+def test_worsening():
+    assert worsening("seconds", 0.5) == 0.5
+    assert worsening("requests_per_second", 0.5) == -0.5  # more requests is an improvement
+    assert worsening("requests_per_second", -0.2) == 0.2
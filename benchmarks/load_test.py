@@ -0,0 +1,220 @@
+"""End to end load test of typed views against hand written flask twins
+
+Usage: `python -m benchmarks.load_test [--sizes 1,100,10000] [--concurrency 8] [--duration 3] [--output results.json]`
+
+Serves the example app in `examples/api.py` from a separate process, with a plain
+`jsonify` based twin of some of its endpoints added under `/raw/`. Both versions of
+each endpoint are then hammered by concurrent client threads using keep-alive
+connections, for every payload size.
+
+Results have requests per second and latency percentiles per endpoint, size and
+variant (`typed` or `raw`), and the relative throughput of the typed variant as
+`<endpoint>/size=<n>/typed_vs_raw`. Everything runs on the local machine, using
+the werkzeug server, so absolute numbers are lower than behind a production server
+while the overhead of `typed()` shows up more clearly.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from flask import Flask, jsonify, request
+
+from benchmarks.results import write_results
+
+SIZES = (1, 100, 10000)
+
+
+@dataclass
+class Endpoint:
+    name: str
+    method: str
+    typed_path: Callable[[int], str]
+    raw_path: Callable[[int], str]
+    payload: Optional[Callable[[int], object]] = None
+
+
+ENDPOINTS = [
+    Endpoint("get_foo", "GET", lambda n: f"/api/foo/{'x' * n}", lambda n: f"/raw/foo/{'x' * n}"),
+    Endpoint(
+        "create_bar", "POST", lambda n: "/api/bar", lambda n: "/raw/bar",
+        lambda n: {"subField": {"oneField": "x" * n}, "otherField": "other"},
+    ),
+    Endpoint("reverse", "POST", lambda n: "/api/reverse", lambda n: "/raw/reverse", lambda n: list(range(n))),
+    Endpoint(
+        "dict_transform", "POST", lambda n: "/api/dict-transform", lambda n: "/raw/dict-transform",
+        lambda n: {f"key{i}": i for i in range(n)},
+    ),
+    Endpoint("binary_bars", "GET", lambda n: f"/api/binary-bars/{n}", lambda n: f"/raw/binary-bars/{n}"),
+]
+
+
+def add_raw_twins(app: Flask):
+    """Hand written equivalents of typed example endpoints"""
+    @app.route("/raw/foo/<foo_id>")
+    def raw_get_foo(foo_id):
+        return jsonify({"oneField": f"hello {foo_id}"})
+
+    @app.route("/raw/bar", methods=["POST"])
+    def raw_create_bar():
+        bar = request.get_json()
+        return jsonify({"oneField": bar["subField"]["oneField"]})
+
+    @app.route("/raw/reverse", methods=["POST"])
+    def raw_reverse():
+        items = request.get_json()
+        items.reverse()
+        return jsonify(items)
+
+    @app.route("/raw/dict-transform", methods=["POST"])
+    def raw_dict_transform():
+        return jsonify({k + "_trans": {"oneField": f"_form{v}"} for k, v in request.get_json().items()})
+
+    @app.route("/raw/binary-bars/<count>")
+    def raw_binary_bars(count):
+        return jsonify([
+            {"subField": {"oneField": str(i)}, "otherField": "binary"} for i in range(int(count))
+        ])
+
+
+def _serve(port_queue: multiprocessing.Queue):
+    from werkzeug.serving import make_server, WSGIRequestHandler
+    from examples.api import app
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    add_raw_twins(app)
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=KeepAliveHandler)
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+def start_server() -> tuple[multiprocessing.Process, int]:
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(port_queue,), daemon=True)
+    process.start()
+    return process, port_queue.get(timeout=30)
+
+
+class _Client:
+    def __init__(self, port: int):
+        self.connection = http.client.HTTPConnection("127.0.0.1", port)
+
+    def request(self, method: str, path: str, body: Optional[bytes]) -> tuple[int, bytes]:
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        self.connection.request(method, path, body=body, headers=headers)
+        response = self.connection.getresponse()
+        return response.status, response.read()
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def load(port: int, method: str, path: str, body: Optional[bytes], concurrency: int, duration: float) -> dict:
+    """Send requests from `concurrency` threads for `duration` seconds"""
+    latencies: list[list[float]] = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    start = threading.Barrier(concurrency + 1)
+
+    def worker(i: int):
+        client = _Client(port)
+        client.request(method, path, body)  # warm up connection
+        start.wait()
+        deadline = time.perf_counter() + duration
+        while (t0 := time.perf_counter()) < deadline:
+            status, _ = client.request(method, path, body)
+            latencies[i].append(time.perf_counter() - t0)
+            if status != 200:
+                errors[i] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    all_latencies = sorted(latency for worker_latencies in latencies for latency in worker_latencies)
+    return {
+        "requests": len(all_latencies),
+        "errors": sum(errors),
+        "requests_per_second": len(all_latencies) / elapsed,
+        "seconds": sum(all_latencies) / len(all_latencies),
+        "p50_ms": percentile(all_latencies, 0.5) * 1000,
+        "p90_ms": percentile(all_latencies, 0.9) * 1000,
+        "p99_ms": percentile(all_latencies, 0.99) * 1000,
+    }
+
+
+def check_twins(port: int, endpoint: Endpoint, size: int, body: Optional[bytes]):
+    """Make sure both variants of an endpoint give the same response, to compare equal work"""
+    client = _Client(port)
+    typed_status, typed_data = client.request(endpoint.method, endpoint.typed_path(size), body)
+    raw_status, raw_data = client.request(endpoint.method, endpoint.raw_path(size), body)
+    if typed_status != 200 or typed_status != raw_status or json.loads(typed_data) != json.loads(raw_data):
+        raise AssertionError(f"Typed and raw responses of {endpoint.name} differ for size {size}")
+
+
+def run(port: int, sizes: list[int], concurrency: int, duration: float, endpoints: list[Endpoint] = ENDPOINTS) -> list[dict]:
+    results = []
+    for endpoint in endpoints:
+        for size in sizes:
+            body = None if endpoint.payload is None else json.dumps(endpoint.payload(size)).encode()
+            check_twins(port, endpoint, size, body)
+            variant_results = {}
+            for variant, path in (("typed", endpoint.typed_path(size)), ("raw", endpoint.raw_path(size))):
+                variant_results[variant] = load(port, endpoint.method, path, body, concurrency, duration)
+                results.append({
+                    "name": f"{endpoint.name}/size={size}/{variant}",
+                    "endpoint": endpoint.name,
+                    "size": size,
+                    "variant": variant,
+                    "concurrency": concurrency,
+                    **variant_results[variant],
+                })
+            results.append({
+                "name": f"{endpoint.name}/size={size}/typed_vs_raw",
+                "endpoint": endpoint.name,
+                "size": size,
+                "throughput_ratio": (
+                    variant_results["typed"]["requests_per_second"] / variant_results["raw"]["requests_per_second"]
+                ),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="Comma separated payload sizes")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of client threads")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds of load per endpoint, size and variant")
+    parser.add_argument("--endpoints", default=None, help="Comma separated endpoint names, defaults to all")
+    parser.add_argument("--output", default=None, help="Result file, defaults to stdout")
+    args = parser.parse_args()
+
+    endpoints = ENDPOINTS
+    if args.endpoints:
+        endpoints = [endpoint for endpoint in ENDPOINTS if endpoint.name in args.endpoints.split(",")]
+    sizes = [int(size) for size in args.sizes.split(",")]
+    process, port = start_server()
+    try:
+        results = run(port, sizes, args.concurrency, args.duration, endpoints)
+    finally:
+        process.terminate()
+        process.join()
+    write_results("load_test", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+from benchmarks.load_test import start_server, run, ENDPOINTS
+
+
+def test_load_test():
+    process, port = start_server()
+    try:
+        results = run(port, [2], concurrency=2, duration=0.05, endpoints=ENDPOINTS)
+    finally:
+        process.terminate()
+        process.join()
+    by_name = {result["name"]: result for result in results}
+    assert len(by_name) == 3 * len(ENDPOINTS)
+    typed = by_name["reverse/size=2/typed"]
+    assert typed["requests"] > 0 and typed["errors"] == 0
+    assert typed["p50_ms"] <= typed["p99_ms"]
+    assert by_name["reverse/size=2/typed_vs_raw"]["throughput_ratio"] > 0
@@ -0,0 +1,47 @@
+"""Machine readable benchmark results
+
+A result file is a json object with the environment the benchmark was run in and a
+list of measurements. Every measurement has a unique `name` within its file and any
+number of numeric metrics, which `benchmarks.compare` matches up between files.
+"""
+import datetime
+import json
+import platform
+import subprocess
+import sys
+from pathlib import Path
+from typing import Optional
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    return {
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def write_results(benchmark: str, results: list[dict], output: Optional[str]):
+    """Write results to a file, or to stdout if no output path is given"""
+    data = json.dumps({"benchmark": benchmark, "environment": environment(), "results": results}, indent=2)
+    if output:
+        Path(output).write_text(data + "\n")
+    else:
+        sys.stdout.write(data + "\n")
+
+
+def load_results(path: str) -> dict[str, dict]:
+    """Load measurements from a result file, keyed by name"""
+    data = json.loads(Path(path).read_text())
+    return {result["name"]: result for result in data["results"]}
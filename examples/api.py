@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import datetime
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Iterator
 
 from flask import Flask, Response, request
 
@@ -89,6 +89,19 @@ def nullable(s: Optional[str]) -> Optional[list[int]]:
     return []
 
 
+@app.route("/api/count-foos/<count>")
+@typed()
+def count_foos(count) -> Iterator[Foo]:
+    for i in range(int(count)):
+        yield Foo(one_field=str(i))
+
+
+@app.route("/api/binary-bars/<count>")
+@typed(msgpack=True)
+def binary_bars(count) -> list[Bar]:
+    return [Bar(sub_field=Foo(one_field=str(i)), other_field="binary") for i in range(int(count))]
+
+
 # enable hot reloads in development mode
 dev_reload_hook(app)
 
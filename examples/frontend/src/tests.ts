@@ -1,4 +1,6 @@
 import {
+  binaryBars,
+  countFoos,
   createBar,
   dictTransform,
   failing,
@@ -63,6 +65,17 @@ const tests = [
       && (await nullable("foo")) instanceof Array
     );
   }],
+  ['streamed items', async () => {
+    const fields = [];
+    for await (const foo of countFoos('3')) {
+      fields.push(foo.oneField);
+    }
+    return JSON.stringify(fields) == JSON.stringify(["0", "1", "2"]);
+  }],
+  ['msgpack response', async () => {
+    const bars = await binaryBars('2');
+    return bars.length == 2 && bars[1].subField.oneField == "1" && bars[1].otherField == "binary";
+  }],
 ]
 
 export default tests;
\ No newline at end of file
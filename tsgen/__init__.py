@@ -1,3 +1,15 @@
 from tsgen.types.typetree import type_registry
-from tsgen.flask_integration import typed, dev_reload_hook, init_tsgen
 
+_FLASK_INTEGRATION = ("typed", "dev_reload_hook", "init_tsgen")
+
+
+def __getattr__(name):
+    # imported on first use, so `tsgen.types` can be used without importing flask
+    if name in _FLASK_INTEGRATION:
+        from tsgen import flask_integration
+        return getattr(flask_integration, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return [*globals(), *_FLASK_INTEGRATION]
@@ -1,14 +1,21 @@
 import dataclasses
+import hashlib
+import json
+import os
 from collections import defaultdict
+from functools import lru_cache
 from pathlib import Path
 from types import FunctionType
-from typing import Optional, get_type_hints
-
-import jinja2
+from typing import Optional
 
 from tsgen.code_snippet_context import CodeSnippetContext
+from tsgen.function_info import (  # noqa: F401, also importable from here
+    TSGenFunctionInfo, Deferred, prepare_function, get_prepared_info, has_prepared_info
+)
+from tsgen.templates import render, templates_fingerprint
+from tsgen.msgpack import MSGPACK_MIMETYPE, TS_UNPACK_MSGPACK, TS_FROM_POSITIONAL, wire_schema
 from tsgen.formatting import to_camel
-from tsgen.types import get_type_tree, AbstractNode
+from tsgen.types import AbstractNode, Stream
 
 
 TS_FILE_PATTERN = """// Generated source code - do not modify this file
@@ -29,67 +36,204 @@ export class ApiError extends Error {
 
 
 TS_FUNC_TEMPLATE = """
-export const {{function_name}} = async ({% for arg_name, type in args %}{{arg_name}}: {{type}}{{ ", " if not loop.last else "" }}{% endfor %}): Promise<{{response_type_name}}> => {
-  const response = await fetch(`{{url_pattern}}`, {
+export const {{function_name}} = {{ "" if shared else "async " }}({% for arg_name, type in args %}{{arg_name}}: {{type}}{{ ", " if not loop.last else "" }}{% endfor %}): Promise<{{response_type_name}}> => {% if shared %}_shared(`{{url_pattern}}`, {{client_cache_ttl_ms}}, async () => {% endif %}{
+  {%- if etag %}
+  const cached = _cachedETag(`{{url_pattern}}`);
+  {%- endif %}
+  const response = await {{fetch_function}}(`{{url_pattern}}`, {
     method: '{{method}}'
-    {%- if payload_expression != None %},
+    {%- if headers %},
     headers: {
-      'Content-Type': 'application/json'
+      {%- for header in headers %}
+      {{header}}{{ "," if not loop.last else "" }}
+      {%- endfor %}
     },
+    {%- endif %}
+    {%- if payload_expression != None %}
     body: JSON.stringify({{payload_expression}}),
     {%- endif %}
   });
+  {%- if etag %}
+  if (response.status === 304 && cached) {
+    return cached.value;
+  }
+  {%- endif %}
   if (!response.ok) {
     throw new ApiError("HTTP status code: " + response.status, response);
   }
   {%- if response_type_name != "void" %}
-  {%- if return_expression == "dto" %}
-  return await response.json();
+  {%- if return_expression == "dto" and not etag %}
+  return {{read_expression}};
   {%- else %}   
-  const dto: {{ response_dto_type }} = await response.json();
+  const dto: {{ response_dto_type }} = {{read_expression}};
+  {%- if etag %}
+  return _cacheETag(`{{url_pattern}}`, response, {{return_expression}});
+  {%- else %}
   return {{return_expression}};
   {%- endif %}
   {%- endif %}
-}
+  {%- endif %}
+}{{ ")" if shared else "" }}
 """
 
+TS_SHARED_REQUESTS = """
+const _sharedRequests = new Map<string, Promise<any>>();
+const _responseCache = new Map<string, { expires: number, value: any }>();
+const _RESPONSE_CACHE_SIZE = 256;
 
-@dataclasses.dataclass
-class TSGenFunctionInfo:
-    """Used for storing information about functions for later use
+// Let concurrent calls for the same url share one request, caching the result for `ttl` ms if > 0
+const _shared = <T>(url: string, ttl: number, request: () => Promise<T>): Promise<T> => {
+  const cached = _responseCache.get(url);
+  if (cached) {
+    _responseCache.delete(url);
+    if (cached.expires > Date.now()) {
+      _responseCache.set(url, cached);  // keep recently used entries last
+      return Promise.resolve(cached.value);
+    }
+  }
+  let promise = _sharedRequests.get(url);
+  if (!promise) {
+    promise = request().then((value) => {
+      if (ttl > 0) {
+        _responseCache.set(url, {expires: Date.now() + ttl, value});
+        if (_responseCache.size > _RESPONSE_CACHE_SIZE) {
+          _responseCache.delete(_responseCache.keys().next().value!);
+        }
+      }
+      return value;
+    }).finally(() => _sharedRequests.delete(url));
+    _sharedRequests.set(url, promise);
+  }
+  return promise;
+}
+"""
 
-    Type hints are (often) easier to evaluate at the point they are declared
-    so instead of storing python types directly, this can be used to store
-    evaluated type trees for functions (see `tsgen.types`) for later use.
-    """
-    return_type_tree: Optional[AbstractNode]
-    arg_type_trees: dict[str, AbstractNode]
+TS_ETAG_CACHE = """
+const _etagCache = new Map<string, { etag: string, value: any }>();
+const _ETAG_CACHE_SIZE = 256;
 
+// The last ETag and value of a url, if any
+const _cachedETag = (url: string): { etag: string, value: any } | undefined => {
+  const cached = _etagCache.get(url);
+  if (cached) {
+    _etagCache.delete(url);
+    _etagCache.set(url, cached);  // keep recently used entries last
+  }
+  return cached;
+}
 
-def prepare_function(func, localns=None) -> TSGenFunctionInfo:
-    annotations = get_type_hints(func)
-    return_value_py_type = annotations.pop("return", None)
-    return_type_tree = None
-    if return_value_py_type is not None:
-        return_type_tree = get_type_tree(return_value_py_type, localns=localns)
+const _cacheETag = <T>(url: string, response: Response, value: T): T => {
+  const etag = response.headers.get('ETag');
+  if (etag) {
+    _etagCache.delete(url);
+    _etagCache.set(url, {etag, value});
+    if (_etagCache.size > _ETAG_CACHE_SIZE) {
+      _etagCache.delete(_etagCache.keys().next().value!);
+    }
+  }
+  return value;
+}
+"""
 
-    arg_type_trees = {n: get_type_tree(t, localns=localns) for n, t in annotations.items()}
+TS_BATCHED_FETCH = """
+type _BatchedCall = {
+  url: string,
+  init: RequestInit,
+  resolve: (response: Response) => void,
+  reject: (reason: any) => void,
+};
+const _batchQueue: _BatchedCall[] = [];
 
-    info = TSGenFunctionInfo(
-        return_type_tree=return_type_tree,
-        arg_type_trees=arg_type_trees
-    )
-    func.tsgen_info = info
-    return func
+const _flushBatch = () => {
+  // the server accepts at most {{max_calls}} calls per batch
+  const queued = _batchQueue.splice(0);
+  for (let i = 0; i < queued.length; i += {{max_calls}}) {
+    _sendBatch(queued.slice(i, i + {{max_calls}}));
+  }
+}
 
+const _sendBatch = async (calls: _BatchedCall[]) => {
+  if (calls.length === 1) {
+    const {url, init, resolve, reject} = calls[0];
+    fetch(url, init).then(resolve, reject);
+    return;
+  }
+  const batch = calls.map(({url}) => `{"url":${JSON.stringify(url)}}`);
+  try {
+    const response = await fetch(`{{batch_url}}`, {
+      method: 'POST',
+      headers: {'Content-Type': 'application/json'},
+      body: `[${batch.join(',')}]`,
+    });
+    if (!response.ok) {
+      throw new ApiError("HTTP status code: " + response.status, response);
+    }
+    const results: { status: number, body: any }[] = await response.json();
+    calls.forEach(({resolve}, i) => {
+      const {status, body} = results[i];
+      resolve(new Response(body === null ? null : JSON.stringify(body), {
+        status,
+        headers: {'Content-Type': 'application/json'},
+      }));
+    });
+  } catch (error) {
+    calls.forEach(({reject}) => reject(error));
+  }
+}
 
-def get_prepared_info(func: FunctionType) -> TSGenFunctionInfo:
-    # noinspection PyUnresolvedReferences
-    return func.tsgen_info
+// Drop-in replacement for fetch of GET calls, sending all calls made in the same tick as a single request
+const _batchedFetch = (url: string, init: RequestInit): Promise<Response> => new Promise((resolve, reject) => {
+  if (_batchQueue.push({url, init, resolve, reject}) === 1) {
+    setTimeout(_flushBatch, 0);
+  }
+});
+"""
 
+TS_READ_NDJSON = """
+async function* _readNDJSON<T>(response: Response): AsyncGenerator<T> {
+  const reader = response.body!.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const {done, value} = await reader.read();
+    buffer += decoder.decode(value, {stream: !done});
+    const lines = buffer.split('\\n');
+    buffer = done ? '' : lines.pop()!;
+    for (const line of lines) {
+      if (line) {
+        yield JSON.parse(line);
+      }
+    }
+    if (done) {
+      return;
+    }
+  }
+}
+"""
 
-def has_prepared_info(func: FunctionType) -> bool:
-    return hasattr(func, "tsgen_info")
+TS_STREAM_FUNC_TEMPLATE = """
+export const {{function_name}} = async function* ({% for arg_name, type in args %}{{arg_name}}: {{type}}{{ ", " if not loop.last else "" }}{% endfor %}): AsyncGenerator<{{response_type_name}}> {
+  const response = await fetch(`{{url_pattern}}`, {
+    method: '{{method}}'
+    {%- if headers %},
+    headers: {
+      {%- for header in headers %}
+      {{header}}{{ "," if not loop.last else "" }}
+      {%- endfor %}
+    },
+    {%- endif %}
+    {%- if payload_expression != None %}
+    body: JSON.stringify({{payload_expression}}),
+    {%- endif %}
+  });
+  if (!response.ok) {
+    throw new ApiError("HTTP status code: " + response.status, response);
+  }
+  for await (const dto of _readNDJSON<{{ response_dto_type }}>(response)) {
+    yield {{return_expression}};
+  }
+}
+"""
 
 
 def build_ts_func(
@@ -99,22 +243,53 @@ def build_ts_func(
         url_pattern: str,
         url_args: list[str],
         method: str,
-        ctx: CodeSnippetContext
+        ctx: CodeSnippetContext,
+        msgpack: bool = False,
+        etag: bool = False,
+        batch_url: Optional[str] = None,
+        client_cache_ttl: Optional[float] = None,
+        batch_max_calls: int = 100,
     ):
+    """Generate a typescript client function for an endpoint
+
+    Concurrent calls of GET functions with the same arguments share a single request.
+
+    :param batch_url: Url of the app's batch endpoint (see `tsgen.flask_integration.init_tsgen`).
+        If set, GET calls of regular json endpoints are coalesced with other calls made in the same tick.
+    :param client_cache_ttl: Seconds to keep reusing the result of a GET function for the same arguments
+    :param batch_max_calls: Most calls the batch endpoint accepts per request, larger batches are split
+    """
     ts_args = []
     for arg in url_args:
         ts_arg_name = to_camel(arg)
         url_pattern = url_pattern.replace(f"<{arg}>", f"${{{ts_arg_name}}}")
         ts_args.append((ts_arg_name, "string"))
 
+    template = "function.ts"
+    headers = []
+    read_expression = "await response.json()"
     if return_type_tree is None:
         ts_return_type = "void"
         return_expression = None
         response_dto_type = None
+    elif isinstance(return_type_tree, Stream):
+        # items are parsed one at a time from a newline delimited json response
+        item_type_tree = return_type_tree.element_node
+        ts_return_type = item_type_tree.ts_repr(ctx)
+        return_expression = item_type_tree.ts_parse_dto(ctx, "dto")
+        response_dto_type = item_type_tree.dto_tree().ts_repr(ctx)
+        ctx.add("_readNDJSON", TS_READ_NDJSON)
+        template = "stream_function.ts"
     else:
         ts_return_type = return_type_tree.ts_repr(ctx)
         return_expression = return_type_tree.ts_parse_dto(ctx, "dto")
         response_dto_type = return_type_tree.dto_tree().ts_repr(ctx)
+        if msgpack:
+            headers.append(f"'Accept': '{MSGPACK_MIMETYPE}'")
+            ctx.add("_unpackMsgpack", TS_UNPACK_MSGPACK)
+            ctx.add("_fromPositional", TS_FROM_POSITIONAL)
+            schema = json.dumps(wire_schema(return_type_tree))
+            read_expression = f"_fromPositional(_unpackMsgpack(await response.arrayBuffer()), {schema})"
 
     if payload:
         payload_name, payload_type_tree = payload
@@ -122,34 +297,88 @@ def build_ts_func(
         payload_arg_name = to_camel(payload_name)
         payload_expression = payload_type_tree.ts_create_dto(ctx, payload_arg_name)
         ts_args.append((payload_arg_name, ts_payload_type))
+        headers.insert(0, "'Content-Type': 'application/json'")
     else:
         payload_expression = None
 
+    if etag:
+        ctx.add("_etagCache", TS_ETAG_CACHE)
+        headers.append("...(cached ? {'If-None-Match': cached.etag} : {})")
+
+    fetch_function = "fetch"
+    if batch_url and method == "GET" and template == "function.ts" and not msgpack and not etag:
+        # only the status and body of batched responses reach the client, so calls with side effects
+        # (which may set cookies) and msgpack and etag endpoints (which rely on their headers) aren't batched
+        ctx.add("_batchedFetch", render("batched_fetch.ts", batch_url=batch_url, max_calls=batch_max_calls))
+        fetch_function = "_batchedFetch"
+
+    shared = method == "GET" and template == "function.ts"
+    if shared:
+        ctx.add("_shared", TS_SHARED_REQUESTS)
+
     ctx.add("ApiError", TS_API_ERROR)
-    ts_function_code = jinja2.Template(TS_FUNC_TEMPLATE).render({
-        "function_name": name,
-        "response_type_name": ts_return_type,
-        "response_dto_type": response_dto_type,
-        "payload_expression": payload_expression,
-        "args": ts_args,
-        "method": method,
-        "url_pattern": url_pattern,
-        "return_expression": return_expression,
-    })
+    ts_function_code = render(
+        template,
+        function_name=name,
+        response_type_name=ts_return_type,
+        response_dto_type=response_dto_type,
+        payload_expression=payload_expression,
+        args=ts_args,
+        method=method,
+        url_pattern=url_pattern,
+        return_expression=return_expression,
+        headers=headers,
+        read_expression=read_expression,
+        etag=etag,
+        fetch_function=fetch_function,
+        shared=shared,
+        client_cache_ttl_ms=round((client_cache_ttl or 0) * 1000),
+    )
     return ts_function_code
 
 
+MANIFEST_FILENAME = ".tsgen-manifest.json"
+MANIFEST_VERSION = 1
+
+
+@dataclasses.dataclass
+class Endpoint:
+    func: FunctionType
+    url_pattern: str
+    url_args: list[str]
+    method: str
+
+
+@dataclasses.dataclass
+class SaveSummary:
+    """Files (relative to the output directory) touched by `ClientBuilder.save_to_disk`"""
+    written: list[str] = dataclasses.field(default_factory=list)
+    unchanged: list[str] = dataclasses.field(default_factory=list)
+    removed: list[str] = dataclasses.field(default_factory=list)
+
+
 @dataclasses.dataclass()
 class ClientBuilder:
+    # snippets of each module, filled in when its file is generated (see `get_file`)
     file_snippets: dict[str, CodeSnippetContext] = dataclasses.field(default_factory=lambda: defaultdict(CodeSnippetContext))
+    batch_url: Optional[str] = None  # coalesce client calls into requests to this url, see `build_ts_func`
+    batch_max_calls: int = 100
+    endpoints: dict[str, list[Endpoint]] = dataclasses.field(default_factory=lambda: defaultdict(list))
+    _file_contents: dict[str, str] = dataclasses.field(default_factory=dict, init=False, repr=False)
 
     def add_endpoint(self, func: FunctionType, url_pattern: str, url_args: list[str], method: str):
-        import_name=func.__module__
-        function_name=func.__name__
-        info = get_prepared_info(func)
-        ts_context = self.file_snippets[import_name]
-        ts_function_name = to_camel(function_name)
-        non_url_args = set(info.arg_type_trees.keys()) - set(url_args)
+        """Add an endpoint to the client file of its module
+
+        The typescript code is generated when the files are requested (see `get_files`).
+        """
+        get_prepared_info(func)  # surface type errors here
+        self.endpoints[func.__module__].append(Endpoint(func, url_pattern, url_args, method))
+        self._file_contents.pop(func.__module__, None)
+
+    def _add_ts_function(self, ts_context: CodeSnippetContext, endpoint: Endpoint):
+        info = get_prepared_info(endpoint.func)
+        ts_function_name = to_camel(endpoint.func.__name__)
+        non_url_args = set(info.arg_type_trees.keys()) - set(endpoint.url_args)
         assert len(non_url_args) <= 1
         payload: Optional[tuple[str, AbstractNode]] = None
         if non_url_args:
@@ -160,33 +389,156 @@ class ClientBuilder:
             ts_function_name,
             info.return_type_tree,
             payload,
-            url_pattern,
-            url_args,
-            method,
+            endpoint.url_pattern,
+            endpoint.url_args,
+            endpoint.method,
             ts_context,
+            msgpack=info.msgpack,
+            etag=info.etag and endpoint.method == "GET",
+            batch_url=self.batch_url,
+            batch_max_calls=self.batch_max_calls,
+            client_cache_ttl=info.client_cache_ttl,
         )
         ts_context.add(ts_function_name, ts_function_code)
 
+    def get_file(self, import_name: str) -> str:
+        """Generate the client file of a module, once per builder"""
+        if import_name in self._file_contents:
+            return self._file_contents[import_name]
+        ctx = self.file_snippets[import_name] = CodeSnippetContext()
+        for endpoint in self.endpoints[import_name]:
+            self._add_ts_function(ctx, endpoint)
+        all_snippets = [
+            ctx.get_snippet(ts_interface_name)
+            for ts_interface_name in ctx.natural_order()
+        ]
+        content = self._file_contents[import_name] = render("file.ts", entities=all_snippets)
+        return content
+
     def get_files(self) -> dict[str, str]:
         """Get contents of all client files built
 
         :return: {<file name>: <file content string>}
         """
-        file_contents = {}
-        for import_name, ctx in self.file_snippets.items():
-            all_snippets = [
-                ctx.get_snippet(ts_interface_name)
-                for ts_interface_name in ctx.natural_order()
-            ]
-            file_contents[import_name] = jinja2.Template(TS_FILE_PATTERN).render(entities=all_snippets)
+        return {import_name: self.get_file(import_name) for import_name in self.endpoints}
 
-        return file_contents
+    def fingerprint(self, import_name: str) -> str:
+        """Hash of everything the client file of a module is generated from
 
-    def save_to_disk(self, root_dir: str):
+        That is the module's routes and the type trees of their functions, as well as
+        the code generator itself (see `generator_fingerprint`).
+        """
+        h = hashlib.sha256(f"{generator_fingerprint()}|{self.batch_url}|{self.batch_max_calls}".encode())
+        for endpoint in self.endpoints[import_name]:
+            info = get_prepared_info(endpoint.func)
+            h.update(repr((
+                endpoint.func.__name__,
+                endpoint.url_pattern,
+                sorted(endpoint.url_args),
+                endpoint.method,
+                info.return_type_tree,
+                sorted(info.arg_type_trees.items()),
+                info.msgpack,
+                info.etag,
+                info.client_cache_ttl,
+            )).encode())
+        return h.hexdigest()
+
+    def save_to_disk(self, root_dir: str, incremental: bool = True, manifest: str = MANIFEST_FILENAME) -> SaveSummary:
+        """Write the client files into `root_dir`, as `<module path>.ts`
+
+        Builds are recorded in a manifest in `root_dir`. With `incremental`, client files of
+        modules whose fingerprint is unchanged since the last build aren't regenerated.
+        Files are only replaced (atomically) when their content changes, so file watchers
+        of frontend tooling don't see unchanged files. Files of modules that no longer have
+        any endpoints are removed.
+
+        :param manifest: File name of the manifest. Builds of different apps into the same directory
+            need different manifests, otherwise each removes the files of the other.
+        """
         root_path = Path(root_dir)
-        for dotpath, content in self.get_files().items():
-            ts_filename = dotpath.replace(".", "/") + ".ts"
+        previous_modules = _load_manifest(root_path / manifest).get("modules", {})
+        summary = SaveSummary()
+        modules = {}
+        for import_name in self.endpoints:
+            ts_filename = import_name.replace(".", "/") + ".ts"
             file_path = root_path / ts_filename
-            file_path.parent.mkdir(parents=True, exist_ok=True)
-            with file_path.open("w", encoding="utf8") as fp:
-                fp.write(content)
\ No newline at end of file
+            fingerprint = self.fingerprint(import_name)
+            entry = previous_modules.get(import_name)
+            up_to_date = (
+                incremental and entry is not None
+                and entry["fingerprint"] == fingerprint
+                and _content_hash(file_path) == entry["content_hash"]  # not edited or removed since
+            )
+            if up_to_date:
+                modules[import_name] = entry
+                summary.unchanged.append(ts_filename)
+                continue
+
+            content = self.get_file(import_name).encode("utf8")
+            content_hash = hashlib.sha256(content).hexdigest()
+            if _content_hash(file_path) == content_hash:
+                summary.unchanged.append(ts_filename)
+            else:
+                _write_atomic(file_path, content)
+                summary.written.append(ts_filename)
+            modules[import_name] = {"file": ts_filename, "fingerprint": fingerprint, "content_hash": content_hash}
+
+        for import_name, entry in previous_modules.items():
+            if import_name not in modules:
+                _remove_stale(root_path, entry["file"])
+                summary.removed.append(entry["file"])
+
+        manifest_content = json.dumps({"version": MANIFEST_VERSION, "modules": modules}, indent=2, sort_keys=True)
+        _write_atomic(root_path / manifest, manifest_content.encode("utf8"))
+        return summary
+
+
+@lru_cache(maxsize=None)
+def _package_sources_hash() -> str:
+    h = hashlib.sha256()
+    package_dir = Path(__file__).parent
+    for path in sorted(package_dir.rglob("*.py")):
+        if not path.name.endswith("__test.py"):
+            h.update(path.relative_to(package_dir).as_posix().encode())
+            h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def generator_fingerprint() -> str:
+    """Hash of tsgen's own sources and the templates in use, which all client files depend on"""
+    return f"{_package_sources_hash()}:{templates_fingerprint()}"
+
+
+def _load_manifest(path: Path) -> dict:
+    try:
+        manifest = json.loads(path.read_text(encoding="utf8"))
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest
+
+
+def _content_hash(path: Path) -> Optional[str]:
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def _write_atomic(path: Path, content: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
+
+
+def _remove_stale(root_path: Path, ts_filename: str):
+    file_path = root_path / ts_filename
+    file_path.unlink(missing_ok=True)
+    # remove directories that only held removed files
+    directory = file_path.parent
+    while directory != root_path and directory.is_dir() and not any(directory.iterdir()):
+        directory.rmdir()
+        directory = directory.parent
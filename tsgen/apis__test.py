@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+import datetime
+import threading
 from dataclasses import dataclass
+from typing import Iterator
 
-from tsgen.apis import build_ts_func
+from tsgen.apis import (
+    build_ts_func, prepare_function, get_prepared_info, Deferred, ClientBuilder, MANIFEST_FILENAME
+)
 from tsgen.code_snippet_context import CodeSnippetContext
 from tsgen.types.typetree import get_type_tree
 
@@ -25,7 +30,7 @@ def test_api_gen():
         ctx
     )
     expected_func_code = """
-export const getFoo = async (myId: string): Promise<Foo> => {
+export const getFoo = (myId: string): Promise<Foo> => _shared(`/api/foo/${myId}`, 0, async () => {
   const response = await fetch(`/api/foo/${myId}`, {
     method: 'GET'
   });
@@ -33,6 +38,144 @@ export const getFoo = async (myId: string): Promise<Foo> => {
     throw new ApiError("HTTP status code: " + response.status, response);
   }
   return await response.json();
+})"""
+    assert func_code == expected_func_code
+    assert sorted(ctx.natural_order()) == ["ApiError", "Foo", "_shared"]
+
+
+def test_api_gen_client_cache():
+    ctx = CodeSnippetContext()
+    get_code = build_ts_func("getFoo", get_type_tree(Foo), None, "/api/foo", [], "GET", ctx, client_cache_ttl=2.5)
+    assert get_code.startswith("\nexport const getFoo = (): Promise<Foo> => _shared(`/api/foo`, 2500, async () => {")
+    post_code = build_ts_func("postFoo", get_type_tree(Foo), None, "/api/foo", [], "POST", ctx, client_cache_ttl=2.5)
+    assert post_code.startswith("\nexport const postFoo = async (): Promise<Foo> => {")
+
+
+def test_api_gen_stream():
+    ctx = CodeSnippetContext()
+    func_code = build_ts_func(
+        "getDates",
+        get_type_tree(Iterator[datetime.datetime]),
+        None,
+        "/api/dates",
+        [],
+        "GET",
+        ctx
+    )
+    expected_func_code = """
+export const getDates = async function* (): AsyncGenerator<Date> {
+  const response = await fetch(`/api/dates`, {
+    method: 'GET'
+  });
+  if (!response.ok) {
+    throw new ApiError("HTTP status code: " + response.status, response);
+  }
+  for await (const dto of _readNDJSON<string>(response)) {
+    yield new Date(dto);
+  }
 }"""
     assert func_code == expected_func_code
-    assert ctx.natural_order() == ["ApiError", "Foo"]
+    assert ctx.natural_order() == ["ApiError", "_readNDJSON"]
+
+
+def test_deferred_prepare_function():
+    def view(count: int) -> list[LaterDefined]:
+        pass
+
+    prepare_function(view, deferred=True)  # LaterDefined isn't resolvable yet
+    assert not view.tsgen_info.resolved
+    globals()["LaterDefined"] = str
+    try:
+        info = get_prepared_info(view)
+    finally:
+        del globals()["LaterDefined"]
+    assert info.return_type_tree == get_type_tree(list[str])
+    assert get_prepared_info(view) is info
+
+
+def test_deferred_runs_once():
+    calls = []
+    start = threading.Barrier(8)
+
+    def factory():
+        calls.append(1)
+        return object()
+
+    deferred = Deferred(factory)
+    results = []
+
+    def worker():
+        start.wait()
+        results.append(deferred.get())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(set(map(id, results))) == 1
+
+
+def _module_function(module: str, name: str, return_type):
+    def func(item_id) -> return_type:
+        pass
+
+    func.__module__ = module
+    func.__name__ = name
+    func.__annotations__ = {"item_id": str, "return": return_type}
+    return prepare_function(func)
+
+
+def _builder(endpoints) -> ClientBuilder:
+    builder = ClientBuilder()
+    for func in endpoints:
+        builder.add_endpoint(func, f"/api/{func.__name__}/<item_id>", ["item_id"], "GET")
+    return builder
+
+
+def test_incremental_save(tmp_path):
+    get_foo = _module_function("app.foos", "get_foo", Foo)
+    get_bar = _module_function("app.bars.api", "get_bar", datetime.date)
+
+    summary = _builder([get_foo, get_bar]).save_to_disk(tmp_path)
+    assert sorted(summary.written) == ["app/bars/api.ts", "app/foos.ts"]
+    assert "Promise<Date>" in (tmp_path / "app/bars/api.ts").read_text()
+    assert (tmp_path / MANIFEST_FILENAME).exists()
+
+    builder = _builder([get_foo, get_bar])
+    summary = builder.save_to_disk(tmp_path)
+    assert summary.written == []
+    assert sorted(summary.unchanged) == ["app/bars/api.ts", "app/foos.ts"]
+    assert not builder.file_snippets  # nothing regenerated
+
+    (tmp_path / "app/foos.ts").write_text("edited")
+    summary = _builder([get_foo, get_bar]).save_to_disk(tmp_path)
+    assert summary.written == ["app/foos.ts"]
+    assert "getFoo" in (tmp_path / "app/foos.ts").read_text()
+
+    summary = _builder([_module_function("app.foos", "get_foo", list[Foo])]).save_to_disk(tmp_path)
+    assert summary.written == ["app/foos.ts"]
+    assert summary.removed == ["app/bars/api.ts"]
+    assert "Promise<Foo[]>" in (tmp_path / "app/foos.ts").read_text()
+    assert not (tmp_path / "app/bars").exists()
+
+    summary = _builder([_module_function("app.foos", "get_foo", list[Foo])]).save_to_disk(tmp_path, incremental=False)
+    assert summary.written == []
+    assert summary.unchanged == ["app/foos.ts"]
+
+
+def test_files_generated_once(tmp_path):
+    builder = _builder([_module_function("app.foos", "get_foo", Foo)])
+    files = builder.get_files()
+    snippets = builder.file_snippets["app.foos"]
+    assert builder.save_to_disk(tmp_path, incremental=False).written == ["app/foos.ts"]
+    assert builder.file_snippets["app.foos"] is snippets  # not generated again
+    assert (tmp_path / "app/foos.ts").read_text() == files["app.foos"]
+
+
+def test_separate_manifests(tmp_path):
+    _builder([_module_function("app.foos", "get_foo", Foo)]).save_to_disk(tmp_path, manifest=".foos.json")
+    _builder([_module_function("app.bars", "get_bar", Foo)]).save_to_disk(tmp_path, manifest=".bars.json")
+    assert (tmp_path / "app/foos.ts").exists()
+    assert (tmp_path / "app/bars.ts").exists()
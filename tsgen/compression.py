@@ -0,0 +1,83 @@
+"""gzip/deflate compression of typed view responses
+
+Enabled per app using the `TSGEN_COMPRESSION` config value or per view with
+`typed(compression=...)`, either as `True` for default settings or as a
+`Compression` instance.
+
+Register callables in `compression_hooks` to measure the effect, they are
+called with a `CompressionStats` for every compressed response.
+"""
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, Optional
+
+# content encoding -> zlib wbits for the matching container format
+ENCODINGS: dict[str, int] = {
+    "gzip": 16 + zlib.MAX_WBITS,
+    "deflate": zlib.MAX_WBITS,
+}
+
+
+@dataclass(frozen=True)
+class Compression:
+    min_size: int = 1024  # smaller responses are not worth the cpu time and header overhead
+    level: int = 6  # zlib compression level, 1 (fastest) to 9 (smallest)
+
+
+@dataclass(frozen=True)
+class CompressionStats:
+    endpoint: str
+    encoding: str
+    original_size: int
+    compressed_size: int
+
+
+compression_hooks: list[Callable[[CompressionStats], None]] = []
+
+
+def get_compression(setting) -> Optional[Compression]:
+    """Normalize a compression setting (None, bool or Compression)"""
+    if setting is True:
+        return Compression()
+    return setting or None
+
+
+def negotiate_encoding(accept_encodings) -> Optional[str]:
+    """Pick a supported encoding from a werkzeug Accept-Encoding header"""
+    return accept_encodings.best_match(list(ENCODINGS))
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, ENCODINGS[encoding])
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(
+        chunks: Iterable[bytes],
+        encoding: str,
+        level: int,
+        on_done: Callable[[int, int], None]
+    ) -> Iterator[bytes]:
+    """Compress chunks incrementally, flushing the output of every chunk
+
+    Every chunk can be decompressed by the client as soon as it arrives, e.g. each item
+    of a streamed response, at the cost of a few bytes per chunk.
+
+    :param on_done: Called with the original and compressed size when the stream is exhausted
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, ENCODINGS[encoding])
+    original_size = compressed_size = 0
+    for chunk in chunks:
+        original_size += len(chunk)
+        output = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        compressed_size += len(output)
+        yield output
+    output = compressor.flush()
+    compressed_size += len(output)
+    yield output
+    on_done(original_size, compressed_size)
+
+
+def report(stats: CompressionStats):
+    for hook in compression_hooks:
+        hook(stats)
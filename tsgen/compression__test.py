@@ -0,0 +1,39 @@
+import gzip
+import zlib
+
+from tsgen.compression import compress, compress_stream, get_compression, Compression
+
+
+def test_get_compression():
+    assert get_compression(None) is None
+    assert get_compression(False) is None
+    assert get_compression(True) == Compression()
+    assert get_compression(Compression(level=1)) == Compression(level=1)
+
+
+def test_compress():
+    data = b"hello" * 100
+    assert gzip.decompress(compress(data, "gzip", 6)) == data
+    assert zlib.decompress(compress(data, "deflate", 6)) == data
+
+
+def test_compress_stream():
+    sizes = []
+    chunks = [b"line %d\n" % i for i in range(1000)]
+    compressed = b"".join(compress_stream(iter(chunks), "gzip", 6, lambda *s: sizes.append(s)))
+    assert gzip.decompress(compressed) == b"".join(chunks)
+    assert sizes == [(len(b"".join(chunks)), len(compressed))]
+
+
+def test_compress_stream_flushes_chunks():
+    produced = []
+
+    def chunks():
+        for i in range(3):
+            produced.append(i)
+            yield b"item %d\n" % i
+
+    stream = compress_stream(chunks(), "gzip", 6, lambda *s: None)
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    assert decompressor.decompress(next(stream)) == b"item 0\n"
+    assert produced == [0]  # first item is readable before the rest is produced
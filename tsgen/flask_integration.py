@@ -1,60 +1,399 @@
+import asyncio
+import dataclasses
+import hashlib
+import inspect
 import os
-from functools import wraps
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import wraps, lru_cache
 from pathlib import Path
 from types import FunctionType
+from typing import Union, Optional, TYPE_CHECKING
 
 import click
 import flask
 import sys
-from flask import request, jsonify, Blueprint, Flask
+from flask import request, Blueprint, Flask
 
-from tsgen.apis import prepare_function, ClientBuilder, get_prepared_info, has_prepared_info
+from tsgen.function_info import prepare_function, get_prepared_info, has_prepared_info, Deferred, TSGenFunctionInfo
+from tsgen.json_backends import get_json_backend, JsonBackend
+from tsgen.msgpack import packb, MSGPACK_MIMETYPE
+from tsgen.compression import (
+    Compression, CompressionStats, get_compression, negotiate_encoding, compress, compress_stream, report
+)
+from tsgen.instrumentation import (
+    PhaseTimer, report as report_timings, load_histograms, format_histograms, remove_stats_files, timing_stats,
+)
+from tsgen.response_cache import ResponseCache, get_response_cache
+from tsgen.types import Stream
+from tsgen.types.codec import compile_create_dto, compile_write_json, Codec
+from tsgen.types.lazy import compile_lazy_parse_dto
 
+if TYPE_CHECKING:
+    from tsgen.apis import ClientBuilder
 
-def typed(localns=None):
+
+def typed(
+        localns=None,
+        json_backend: Union[str, JsonBackend, None] = None,
+        lazy: bool = False,
+        columnar: bool = False,
+        msgpack: bool = False,
+        compression: Union[bool, Compression, None] = None,
+        etag: bool = False,
+        cache: Union[bool, ResponseCache, None] = None,
+        offload: Union[bool, Executor] = False,
+        client_cache_ttl: Optional[float] = None,
+        deferred: Optional[bool] = None,
+    ):
     """Decorator to mark flask view function for typescript client support
 
     * Mark a view for typescript client code generation
     * Inject an attached json body as a typed argument
     * Allow for custom data <-> json conversions in injected and returned data
     * Always return json for return-value-annotated views
+    * Stream views annotated to return an `Iterator[T]`/`Iterable[T]` as newline delimited json
+    * Support `async def` views, which Flask runs when installed with the `async` extra
+
+    :param localns: Local namespace used for resolving postponed type annotations
+    :param json_backend: Json encoder/decoder to use for this view (see `tsgen.json_backends`),
+        defaults to the app's `TSGEN_JSON_BACKEND` config or the fastest one available
+    :param lazy: Inject payload objects as `tsgen.types.lazy.LazyObject` views that only
+        parse fields when they are accessed
+    :param columnar: Send a `list[<dataclass>]` return value as an object of lists,
+        without repeating keys for every item. Generated clients transpose it back.
+    :param msgpack: Send the return value as compact msgpack to clients that accept
+        `application/x-msgpack`, which generated clients do (see `tsgen.msgpack`)
+    :param compression: gzip/deflate settings for responses (see `tsgen.compression`),
+        overriding the app's `TSGEN_COMPRESSION` config. Use False to disable.
+    :param etag: Add strong ETags to GET responses and answer matching `If-None-Match`
+        requests with 304 Not Modified. Generated clients keep the last response per url.
+    :param cache: Memoize encoded GET responses by url arguments (see `tsgen.response_cache`).
+        The cache is available as `view.tsgen_cache` for invalidation.
+    :param offload: Run payload parsing and response encoding of an async view in a thread pool,
+        so the event loop isn't blocked by converting large values. Either True for a shared
+        pool or a `concurrent.futures.Executor` to use.
+    :param client_cache_ttl: Seconds generated clients may reuse the result of a GET call
+        for the same url. Concurrent calls always share a single request.
+    :param deferred: Evaluate the annotations and compile the conversions of the view when it's first
+        used, by a request, `build_ts_api` or `warm_up`, instead of at import time. Defaults to True if
+        the `TSGEN_DEFERRED` environment variable is set (to anything but 0).
     """
     def generator(func: FunctionType):
-        prepare_function(func, localns=localns)
-        info = get_prepared_info(func)
+        defer = deferred
+        if defer is None:
+            defer = os.environ.get("TSGEN_DEFERRED", "") not in ("", "0")
+        prepare_function(
+            func, localns=localns, columnar=columnar, msgpack=msgpack, etag=etag, client_cache_ttl=client_cache_ttl,
+            deferred=True,
+        )
+        response_cache = get_response_cache(cache)
+
+        def create_conversions() -> _ViewConversions:
+            conversions = _ViewConversions.create(get_prepared_info(func), lazy)
+            if response_cache is not None and (conversions.info.return_type_tree is None or conversions.streaming):
+                raise TypeError(
+                    f"Can't cache responses of {func.__name__}, only non-streamed typed return values are cached"
+                )
+            return conversions
+
+        view_conversions = Deferred(create_conversions)
+        if not defer:
+            view_conversions.get()
+
+        def encode(response, use_msgpack: bool, backend: JsonBackend, conv: _ViewConversions) -> tuple[bytes, str]:
+            if use_msgpack:
+                return packb(conv.positional_dto_creator(response)), MSGPACK_MIMETYPE
+            return (
+                backend.dumps_typed(response, conv.info.return_dto_creator, conv.info.return_json_writer),
+                "application/json",
+            )
 
-        @wraps(func)
-        def new_f(**kwargs):
+        def inject_payload(
+                kwargs: dict, data: bytes, backend: JsonBackend, timer: Optional[PhaseTimer], conv: _ViewConversions
+        ) -> dict:
             # if dataclass arg has been specified, build one and add it as an arg
             new_kwargs = kwargs.copy()
-            payload_args = set(info.arg_type_trees.keys()) - set(kwargs.keys())
+            payload_args = set(conv.info.arg_type_trees.keys()) - set(kwargs.keys())
             if payload_args:
                 payload_name = list(payload_args)[0]
-                payload_tree = info.arg_type_trees[payload_name]
-                new_kwargs[payload_name] = payload_tree.parse_dto(request.json)
+                if timer is None:
+                    new_kwargs[payload_name] = conv.arg_dto_parsers[payload_name](_load_payload(data, backend))
+                else:
+                    timer.timings.request_size = len(data)
+                    dto = _load_payload(data, backend)
+                    timer.mark("load")
+                    new_kwargs[payload_name] = conv.arg_dto_parsers[payload_name](dto)
+                    timer.mark("parse")
+            return new_kwargs
+
+        def lookup(kwargs: dict, use_msgpack: bool):
+            if response_cache is None or request.method not in ("GET", "HEAD"):
+                return None, None
+            cache_key = response_cache.key(request.endpoint, kwargs, use_msgpack, request.headers)
+            return cache_key, response_cache.get(cache_key)
+
+        def respond(response, encoded, cache_key, backend: JsonBackend, timer: Optional[PhaseTimer], conv: _ViewConversions):
+            if conv.streaming:
+                http_response = _ndjson_response(response, conv.item_dto_creator, conv.item_json_writer, backend)
+            else:
+                if cache_key is not None:
+                    response_cache.set(cache_key, encoded)
+                body, mimetype = encoded
+                http_response = flask.current_app.response_class(body, mimetype=mimetype)
+                if timer is not None:
+                    timer.timings.response_size = len(body)
+            if timer is not None:
+                _report_timings(http_response, timer)
+            return _finish_response(http_response, conv)
+
+        if inspect.iscoroutinefunction(func):
+            executor = _get_offload_executor(offload)
+
+            async def convert(f, *args):
+                if executor is None:
+                    return f(*args)
+                return await asyncio.get_running_loop().run_in_executor(executor, f, *args)
 
-            response = func(**new_kwargs)
-            if info.return_type_tree is None:
-                return response  # unannotated return value returns raw response
-            return jsonify(info.return_type_tree.create_dto(response))
+            @wraps(func)
+            async def new_f(**kwargs):
+                conv = view_conversions.get()
+                timer = _start_timer()
+                backend = _get_backend(json_backend)
+                use_msgpack = conv.info.msgpack and _accepts_msgpack()
+                cache_key, encoded = lookup(kwargs, use_msgpack)
+                if encoded is not None:
+                    if timer is not None:
+                        timer.mark("cache")
+                    return respond(None, encoded, None, backend, timer, conv)
 
+                new_kwargs = await convert(inject_payload, kwargs, _payload_data(kwargs, conv), backend, timer, conv)
+                response = await func(**new_kwargs)
+                if timer is not None:
+                    timer.mark("view")
+                if conv.info.return_type_tree is None:
+                    return response  # unannotated return value returns raw response
+                if not conv.streaming:
+                    encoded = await convert(encode, response, use_msgpack, backend, conv)
+                    if timer is not None:
+                        timer.mark("encode")
+                return respond(response, encoded, cache_key, backend, timer, conv)
+        else:
+            if offload:
+                raise TypeError(f"Can't offload conversion of {func.__name__}, only async views can be offloaded")
+
+            @wraps(func)
+            def new_f(**kwargs):
+                conv = view_conversions.get()
+                timer = _start_timer()
+                backend = _get_backend(json_backend)
+                use_msgpack = conv.info.msgpack and _accepts_msgpack()
+                cache_key, encoded = lookup(kwargs, use_msgpack)
+                if encoded is not None:
+                    if timer is not None:
+                        timer.mark("cache")
+                    return respond(None, encoded, None, backend, timer, conv)
+
+                response = func(**inject_payload(kwargs, _payload_data(kwargs, conv), backend, timer, conv))
+                if timer is not None:
+                    timer.mark("view")
+                if conv.info.return_type_tree is None:
+                    return response  # unannotated return value returns raw response
+                if not conv.streaming:
+                    encoded = encode(response, use_msgpack, backend, conv)
+                    if timer is not None:
+                        timer.mark("encode")
+                return respond(response, encoded, cache_key, backend, timer, conv)
+
+        def _finish_response(http_response: flask.Response, conv: _ViewConversions) -> flask.Response:
+            if conv.info.msgpack:
+                http_response.vary.add("Accept")
+            if conv.info.etag and request.method in ("GET", "HEAD"):
+                tag = hashlib.blake2b(http_response.get_data(), digest_size=16).hexdigest()
+                http_response.set_etag(tag)
+                if _etag_matches(tag):
+                    return _not_modified_response(http_response)
+
+            compression_settings = compression
+            if compression_settings is None:
+                compression_settings = flask.current_app.config.get("TSGEN_COMPRESSION")
+            if compression_settings := get_compression(compression_settings):
+                _compress_response(http_response, compression_settings)
+            return http_response
+
+        new_f.tsgen_cache = response_cache
+        new_f.tsgen_conversions = view_conversions
         return new_f
 
     return generator
 
 
-def build_ts_api(app: flask.Flask) -> ClientBuilder:
+@dataclasses.dataclass
+class _ViewConversions:
+    """Compiled conversions used by a typed view at request time"""
+    info: TSGenFunctionInfo
+    arg_dto_parsers: dict[str, Codec]
+    streaming: bool = False
+    item_dto_creator: Optional[Codec] = None
+    item_json_writer: Optional[Codec] = None
+    positional_dto_creator: Optional[Codec] = None
+
+    @classmethod
+    def create(cls, info: TSGenFunctionInfo, lazy: bool) -> "_ViewConversions":
+        conversions = cls(info, info.arg_dto_parsers)
+        if lazy:
+            conversions.arg_dto_parsers = {n: compile_lazy_parse_dto(t) for n, t in info.arg_type_trees.items()}
+        if isinstance(info.return_type_tree, Stream):
+            conversions.streaming = True
+            conversions.item_dto_creator = compile_create_dto(info.return_type_tree.element_node)
+            conversions.item_json_writer = compile_write_json(info.return_type_tree.element_node)
+        if info.msgpack:
+            conversions.positional_dto_creator = compile_create_dto(info.return_type_tree, positional_objects=True)
+        return conversions
+
+
+def warm_up(app: flask.Flask):
+    """Resolve the types of all typed views of an app that deferred it (see `typed()`)
+
+    Call this before forking worker processes, so resolution isn't repeated in every worker,
+    or to make any errors in type annotations surface at startup.
+    """
+    for func in app.view_functions.values():
+        _resolve_view(func)
+
+
+def _resolve_view(func):
+    if has_prepared_info(func):
+        get_prepared_info(func)
+    if hasattr(func, "tsgen_conversions"):
+        func.tsgen_conversions.get()
+
+
+def _get_backend(json_backend) -> JsonBackend:
+    return get_json_backend(json_backend or flask.current_app.config.get("TSGEN_JSON_BACKEND"))
+
+
+def _start_timer() -> Optional[PhaseTimer]:
+    if not flask.current_app.config.get("TSGEN_TIMING"):
+        return None
+    return PhaseTimer(request.endpoint)
+
+
+def _report_timings(http_response: flask.Response, timer: PhaseTimer):
+    config = flask.current_app.config
+    if config.get("TSGEN_SERVER_TIMING"):
+        http_response.headers["Server-Timing"] = timer.server_timing()
+    report_timings(timer.timings, config.get("TSGEN_TIMING_STATS_FILE"))
+
+
+def _payload_data(kwargs: dict, conv: _ViewConversions) -> bytes:
+    """The request body, checked to be non-empty json if the view expects a payload"""
+    if not set(conv.info.arg_type_trees) - set(kwargs):
+        return b""
+    if not request.is_json:
+        flask.abort(415)
+    data = request.get_data()
+    if not data:
+        flask.abort(400)
+    return data
+
+
+def _load_payload(data: bytes, backend: JsonBackend):
+    if not data:
+        return None
+    try:
+        return backend.loads(data)
+    except ValueError:  # json decode errors of all backends are ValueErrors
+        flask.abort(400)
+
+
+def _json_response(body: bytes) -> flask.Response:
+    return flask.current_app.response_class(body, mimetype="application/json")
+
+
+@lru_cache(maxsize=None)
+def _default_offload_executor() -> ThreadPoolExecutor:
+    # shared, since flask runs every async view in a new event loop
+    return ThreadPoolExecutor(thread_name_prefix="tsgen-conversion")
+
+
+def _get_offload_executor(setting: Union[bool, Executor]) -> Optional[Executor]:
+    if setting is True:
+        return _default_offload_executor()
+    return setting or None
+
+
+def _accepts_msgpack() -> bool:
+    return request.accept_mimetypes.best_match(["application/json", MSGPACK_MIMETYPE]) == MSGPACK_MIMETYPE
+
+
+def _etag_matches(tag: str) -> bool:
+    if request.if_none_match.star_tag:
+        return True
+    # compressed responses get the encoding appended to the tag, see `_compress_response`
+    return any(
+        client_tag == tag or client_tag.startswith(f"{tag}-")
+        for client_tag in request.if_none_match.as_set(include_weak=True)
+    )
+
+
+def _not_modified_response(http_response: flask.Response) -> flask.Response:
+    not_modified = flask.current_app.response_class(status=304)
+    for header in ("ETag", "Vary"):
+        if header in http_response.headers:
+            not_modified.headers[header] = http_response.headers[header]
+    return not_modified
+
+
+def _compress_response(http_response: flask.Response, settings: Compression):
+    http_response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None:
+        return
+    endpoint = request.endpoint
+
+    if http_response.is_streamed:
+        def on_done(original_size, compressed_size):
+            report(CompressionStats(endpoint, encoding, original_size, compressed_size))
+
+        http_response.response = compress_stream(http_response.response, encoding, settings.level, on_done)
+    else:
+        data = http_response.get_data()
+        if len(data) < settings.min_size:
+            return
+        compressed = compress(data, encoding, settings.level)
+        http_response.set_data(compressed)
+        report(CompressionStats(endpoint, encoding, len(data), len(compressed)))
+    http_response.headers["Content-Encoding"] = encoding
+    tag, weak = http_response.get_etag()
+    if tag and not weak:
+        # strong etags must differ between encodings of the same content
+        http_response.set_etag(f"{tag}-{encoding}")
+
+
+def _ndjson_response(items, item_dto_creator: Codec, item_json_writer: Codec, backend: JsonBackend) -> flask.Response:
+    """Stream items as newline delimited json, converting one item at a time"""
+    def generate():
+        for item in items:
+            yield backend.dumps_typed(item, item_dto_creator, item_json_writer) + b"\n"
+
+    return flask.current_app.response_class(flask.stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+def build_ts_api(app: flask.Flask) -> "ClientBuilder":
     """Generate typescript clients and types for a flask app
 
     :param app: Flask app with @typed()-decorated api routes
     :return: dictionary {filename: typescript_source_code}
     """
-    client_builder = ClientBuilder()
+    from tsgen.apis import ClientBuilder  # code generation isn't needed for serving requests
+
+    client_builder = ClientBuilder(batch_url=app.extensions.get("tsgen_batch_url"), batch_max_calls=MAX_BATCH_CALLS)
 
     for rule in app.url_map.iter_rules():
         func = app.view_functions[rule.endpoint]
 
         if has_prepared_info(func):
+            _resolve_view(func)  # surface errors of deferred views
             method = "GET"
             if "POST" in rule.methods:
                 method = "POST"
@@ -68,7 +407,7 @@ def build_ts_api(app: flask.Flask) -> ClientBuilder:
     return client_builder
 
 
-def build_and_save_api(app: flask.Flask, root_dir: str = None):
+def build_and_save_api(app: flask.Flask, root_dir: str = None, incremental: bool = True):
     if root_dir is None:
         root_dir = os.environ.get("TSGEN_OUTPUT_DIR")
     if not root_dir:
@@ -76,18 +415,23 @@ def build_and_save_api(app: flask.Flask, root_dir: str = None):
 
     app.logger.info(f"Writing client code to {root_dir}")
     client_builder = build_ts_api(app)
-    client_builder.save_to_disk(root_dir)
+    # per app manifests, so apps sharing an output directory don't remove each other's files
+    manifest = f".tsgen-manifest.{app.name}.json"
+    summary = client_builder.save_to_disk(root_dir, incremental=incremental, manifest=manifest)
+    app.logger.info(
+        f"Wrote {len(summary.written)} files, {len(summary.unchanged)} unchanged, removed {len(summary.removed)}"
+    )
 
 
 def dev_reload_hook(app: flask.Flask, root_dir: str = None):
     """Rebuild typescript every time the flask app is (re)started
 
     Call this at module scope in your flask app main file.
-    Only triggers in development mode.
+    Only triggers in debug mode.
     """
     # noinspection PyBroadException
     try:
-        if app.config["ENV"] != "development":
+        if not app.debug:
             return
         if "run" not in " ".join(sys.argv):
             return  # when not running the flask dev server
@@ -102,9 +446,100 @@ cli_blueprint = Blueprint("tsgen", __name__)
 
 @cli_blueprint.cli.command("build")
 @click.option('--output-dir', default=None)
-def build(output_dir):
-    build_and_save_api(flask.current_app, output_dir)
+@click.option('--full', is_flag=True, help="Regenerate all files, even of modules unchanged since the last build")
+def build(output_dir, full):
+    build_and_save_api(flask.current_app, output_dir, incremental=not full)
+
+
+@cli_blueprint.cli.command("stats")
+@click.option('--stats-file', default=None, help="Defaults to the app's TSGEN_TIMING_STATS_FILE config")
+@click.option('--reset', is_flag=True, help="Remove the saved stats files after showing them")
+def stats(stats_file, reset):
+    """Show request timings saved by a server running with TSGEN_TIMING"""
+    stats_file = stats_file or flask.current_app.config.get("TSGEN_TIMING_STATS_FILE")
+    if stats_file:
+        histograms = load_histograms(stats_file)
+    else:
+        histograms = timing_stats.histograms()
+    click.echo(format_histograms(histograms))
+    if reset and stats_file:
+        click.echo(f"Removed {remove_stats_files(stats_file)} stats files")
+
+
+MAX_BATCH_CALLS = 100
+
+# headers describing the batch request itself rather than the batched calls
+_BATCH_OWN_HEADERS = {
+    "content-type", "content-length", "content-encoding", "accept", "accept-encoding",
+    "if-none-match", "if-modified-since",
+}
+
+
+def _batch_view():
+    """Dispatch a list of typed calls and return their results together
+
+    Request: `[{"url": <url>}, ...]`
+    Response: `[{"status": <status code>, "body": <json response or null>}, ...]`
+
+    Every call is a regular GET request to the app, running the app's request hooks and error handlers.
+    Only the status and json body of its response are returned. A failing call only affects its own result.
+    """
+    app = flask.current_app._get_current_object()
+    backend = _get_backend(None)
+    calls = _load_payload(request.get_data(), backend)
+    if not isinstance(calls, list) or len(calls) > MAX_BATCH_CALLS:
+        flask.abort(400)
+    headers = [(name, value) for name, value in request.headers if name.lower() not in _BATCH_OWN_HEADERS]
+    results = [_dispatch_batched_call(app, call, headers) for call in calls]
+
+    http_response = _json_response(b"[" + b",".join(results) + b"]")
+    if compression_settings := get_compression(app.config.get("TSGEN_COMPRESSION")):
+        _compress_response(http_response, compression_settings)
+    return http_response
+
+
+def _dispatch_batched_call(app: Flask, call, headers: list[tuple[str, str]]) -> bytes:
+    if not (
+        isinstance(call, dict)
+        and isinstance(call.get("url"), str)
+        and isinstance(call.get("method", "GET"), str)
+    ):
+        return _batch_result(400, None)  # malformed calls only fail themselves
+    if call.get("method", "GET") != "GET":
+        # headers of the responses (e.g. cookies) are dropped, so only calls without side effects are batched
+        return _batch_result(405, None)
+    # a fresh app context per call, so calls don't share `flask.g`
+    with app.app_context(), app.test_request_context(
+            call["url"],
+            base_url=request.url_root,
+            headers=headers,
+            environ_base={"REMOTE_ADDR": request.remote_addr},
+    ):
+        rule = request.url_rule
+        if rule is not None:
+            func = app.view_functions[rule.endpoint]
+            if not has_prepared_info(func) or isinstance(get_prepared_info(func).return_type_tree, Stream):
+                return _batch_result(400, None)
+        try:
+            http_response = app.full_dispatch_request()
+        except Exception:
+            app.logger.exception(f"Batched call to {call['url']} failed")
+            return _batch_result(500, None)
+        body = http_response.get_data() if http_response.mimetype == "application/json" else None
+        return _batch_result(http_response.status_code, body or None)
 
 
-def init_tsgen(app: Flask):
+def _batch_result(status: int, body: Optional[bytes]) -> bytes:
+    return b'{"status":%d,"body":%s}' % (status, body or b"null")
+
+
+def init_tsgen(app: Flask, batch_url: Optional[str] = None):
+    """Register tsgen's cli commands with an app
+
+    :param batch_url: Register an endpoint that accepts many typed calls in a single request at this url.
+        Generated clients then coalesce calls made in the same tick into batches.
+    """
     app.register_blueprint(cli_blueprint)
+    if batch_url:
+        app.add_url_rule(batch_url, "tsgen_batch", _batch_view, methods=["POST"])
+        app.extensions["tsgen_batch_url"] = batch_url
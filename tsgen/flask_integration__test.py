@@ -1,15 +1,24 @@
 from __future__ import annotations
 
+import asyncio
 import datetime
+import gzip
 import json
 from dataclasses import dataclass
+from typing import Iterator
 
+import flask
 import pytest
 from flask import Flask, Response
 
-from tsgen.flask_integration import typed, build_ts_api
+from tsgen.compression import Compression, compression_hooks
+from tsgen.instrumentation import timing_hooks, timing_stats
+from tsgen.flask_integration import typed, build_ts_api, init_tsgen, warm_up
+from tsgen.msgpack import unpackb
+from tsgen.response_cache import ResponseCache
 
 test_app = Flask(__name__)
+init_tsgen(test_app, batch_url="/api/batch")
 
 
 @pytest.fixture
@@ -51,12 +60,105 @@ def floatify(the_foo: str) -> float:
     return float(the_foo.strip("#"))
 
 
+@test_app.route("/api/stream_bars/<count>")
+@typed()
+def stream_bars(count) -> Iterator[Bar]:
+    for i in range(int(count)):
+        yield Bar(one_field=datetime.datetime(2020, 10, 2, i))
+
+
+@test_app.route("/api/stdlib_json", methods=["POST"])
+@typed(json_backend="stdlib")
+def stdlib_json(names: list[str]) -> dict[str, int]:
+    return {name: len(name) for name in names}
+
+
+@test_app.route("/api/lazy_peek", methods=["POST"])
+@typed(lazy=True)
+def lazy_peek(the_foo: Foo) -> str:
+    return the_foo.other_field
+
+
+@test_app.route("/api/columnar_bars")
+@typed(columnar=True, client_cache_ttl=5)
+def columnar_bars() -> list[Bar]:
+    return [Bar(one_field=datetime.datetime(2020, 10, 2)), Bar(one_field=datetime.datetime(2020, 10, 3))]
+
+
+@test_app.route("/api/msgpack_bar")
+@typed(msgpack=True)
+def msgpack_bar() -> Bar:
+    return Bar(one_field=datetime.datetime(2020, 10, 2))
+
+
+@test_app.route("/api/compressed/<count>")
+@typed(compression=Compression(min_size=100))
+def compressed(count) -> list[str]:
+    return ["hello"] * int(count)
+
+
+@test_app.route("/api/compressed_stream/<count>")
+@typed(compression=True)
+def compressed_stream(count) -> Iterator[str]:
+    for i in range(int(count)):
+        yield "hello"
+
+
+@test_app.route("/api/etag_bar")
+@typed(etag=True, compression=Compression(min_size=0))
+def etag_bar() -> Bar:
+    return Bar(one_field=datetime.datetime(2020, 10, 2))
+
+
+cached_calls = []
+
+
+@test_app.route("/api/cached_bar/<hour>")
+@typed(cache=ResponseCache(max_entries=10), msgpack=True, etag=True)
+def cached_bar(hour) -> Bar:
+    cached_calls.append(hour)
+    return Bar(one_field=datetime.datetime(2020, 10, 2, int(hour)))
+
+
+@test_app.route("/api/async_endpoint", methods=["POST"])
+@typed()
+async def async_endpoint(the_foo: Foo) -> Bar:
+    await asyncio.sleep(0)
+    return the_foo.sub_field
+
+
+@test_app.route("/api/offloaded_endpoint", methods=["POST"])
+@typed(offload=True)
+async def offloaded_endpoint(names: list[str]) -> list[Bar]:
+    await asyncio.sleep(0)
+    return [Bar(one_field=datetime.datetime(2020, 10, 2, len(name))) for name in names]
+
+
 def test_non_dataclass_payloads(client):
     response = client.post("/api/floatify", data=json.dumps("#3.5#"), content_type="application/json")
     assert response.status_code == 200
     assert 3.5 == response.json
 
 
+def test_malformed_payload(client):
+    response = client.post("/api/floatify", data=b"{bad", content_type="application/json")
+    assert response.status_code == 400
+    response = client.post("/api/stdlib_json", data=b"{bad", content_type="application/json")
+    assert response.status_code == 400
+
+
+def test_missing_payload(client):
+    response = client.post("/api/floatify", data=b"", content_type="application/json")
+    assert response.status_code == 400
+    response = client.post("/api/request_response_endpoint", data=b"", content_type="application/json")
+    assert response.status_code == 400
+
+
+def test_non_json_payload(client):
+    response = client.post("/api/floatify", data=b'{"x": 1}', content_type="text/plain")
+    assert response.status_code == 415
+
+
 def test_request_response(client):
     response: test_app.response_class = client.post(
         "/api/request_response_endpoint",
@@ -89,6 +191,287 @@ def test_raw_response(client):
     assert response.data == b''
 
 
+def test_json_backend(client):
+    response = client.post("/api/stdlib_json", data=json.dumps(["ab", "ö"]), content_type="application/json")
+    assert response.status_code == 200
+    assert response.mimetype == "application/json"
+    assert response.data == '{"ab":2,"ö":1}'.encode("utf8")
+
+
+def test_lazy_payload(client):
+    response = client.post(
+        "/api/lazy_peek",
+        data=json.dumps({"otherField": "peek", "subField": {"oneField": "invalid date"}}),
+        content_type="application/json"
+    )
+    assert response.status_code == 200
+    assert response.json == "peek"
+
+
+def test_columnar_response(client):
+    response = client.get("/api/columnar_bars")
+    assert response.status_code == 200
+    assert response.json == {"oneField": ["2020-10-02T00:00:00Z", "2020-10-03T00:00:00Z"]}
+
+
+def test_msgpack_response(client):
+    response = client.get("/api/msgpack_bar", headers={"Accept": "application/x-msgpack"})
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-msgpack"
+    assert "Accept" in response.vary
+    assert unpackb(response.data) == ["2020-10-02T00:00:00Z"]
+
+    response = client.get("/api/msgpack_bar")
+    assert response.mimetype == "application/json"
+    assert response.json == {"oneField": "2020-10-02T00:00:00Z"}
+
+
+def test_compression(client):
+    stats = []
+    compression_hooks.append(stats.append)
+    try:
+        response = client.get("/api/compressed/100", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.vary
+        assert gzip.decompress(response.data) == json.dumps(["hello"] * 100, separators=(",", ":")).encode()
+        assert len(stats) == 1
+        assert stats[0].endpoint == "compressed"
+        assert stats[0].compressed_size == len(response.data)
+
+        response = client.get("/api/compressed/2", headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in response.headers  # below threshold
+        assert response.json == ["hello", "hello"]
+
+        response = client.get("/api/compressed/100")
+        assert "Content-Encoding" not in response.headers
+    finally:
+        compression_hooks.remove(stats.append)
+
+
+def test_compressed_stream(client):
+    response = client.get("/api/compressed_stream/3", headers={"Accept-Encoding": "gzip"})
+    assert response.is_streamed
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.data) == b'"hello"\n' * 3
+
+
+def test_etag(client):
+    response = client.get("/api/etag_bar")
+    assert response.status_code == 200
+    tag, weak = response.get_etag()
+    assert tag and not weak
+
+    response = client.get("/api/etag_bar", headers={"If-None-Match": f'"{tag}"'})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.get_etag() == (tag, False)
+
+    response = client.get("/api/etag_bar", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+
+
+def test_etag_compressed(client):
+    response = client.get("/api/etag_bar", headers={"Accept-Encoding": "gzip"})
+    tag, _ = response.get_etag()
+    assert tag.endswith("-gzip")
+    response = client.get("/api/etag_bar", headers={"Accept-Encoding": "gzip", "If-None-Match": f'"{tag}"'})
+    assert response.status_code == 304
+
+
+def test_cached_response(client):
+    cached_bar.tsgen_cache.invalidate()
+    cached_calls.clear()
+    first = client.get("/api/cached_bar/1")
+    second = client.get("/api/cached_bar/1")
+    assert first.json == second.json == {"oneField": "2020-10-02T01:00:00Z"}
+    assert second.get_etag() == first.get_etag()
+    assert cached_calls == ["1"]
+
+    response = client.get("/api/cached_bar/1", headers={"Accept": "application/x-msgpack"})
+    assert unpackb(response.data) == ["2020-10-02T01:00:00Z"]
+    client.get("/api/cached_bar/2")
+    assert cached_calls == ["1", "1", "2"]
+
+    cached_bar.tsgen_cache.invalidate(hour="1")
+    client.get("/api/cached_bar/1")
+    client.get("/api/cached_bar/2")
+    assert cached_calls == ["1", "1", "2", "1"]
+    assert cached_bar.tsgen_cache.hits == 2
+
+
+def test_cache_requires_typed_return_value():
+    def streamed() -> Iterator[str]:
+        yield "hello"
+
+    with pytest.raises(TypeError):
+        typed(cache=True)(streamed)
+
+
+def test_async_view(client):
+    response = client.post(
+        "/api/async_endpoint",
+        data=json.dumps({"otherField": "hello", "subField": {"oneField": "2020-10-02T05:04:03Z"}}),
+        content_type="application/json"
+    )
+    assert response.status_code == 200
+    assert response.json == {"oneField": "2020-10-02T05:04:03Z"}
+
+
+def test_offloaded_async_view(client):
+    response = client.post("/api/offloaded_endpoint", data=json.dumps(["a", "bb"]), content_type="application/json")
+    assert response.status_code == 200
+    assert response.json == [{"oneField": "2020-10-02T01:00:00Z"}, {"oneField": "2020-10-02T02:00:00Z"}]
+
+
+def test_offload_requires_async_view():
+    def sync_view() -> str:
+        return "hello"
+
+    with pytest.raises(TypeError):
+        typed(offload=True)(sync_view)
+
+
+def test_deferred_view():
+    app = Flask(__name__)
+
+    @app.route("/api/deferred", methods=["POST"])
+    @typed(deferred=True)
+    def deferred_view(the_foo: Foo) -> Bar:
+        return the_foo.sub_field
+
+    conversions = app.view_functions["deferred_view"].tsgen_conversions
+    assert not conversions.resolved
+    response = app.test_client().post(
+        "/api/deferred",
+        data=json.dumps({"otherField": "hello", "subField": {"oneField": "2020-10-02T05:04:03Z"}}),
+        content_type="application/json"
+    )
+    assert response.json == {"oneField": "2020-10-02T05:04:03Z"}
+    assert conversions.resolved
+
+
+def test_warm_up():
+    app = Flask(__name__)
+
+    @app.route("/api/deferred")
+    @typed(deferred=True)
+    def deferred_view() -> list[Bar]:
+        return []
+
+    warm_up(app)
+    assert app.view_functions["deferred_view"].tsgen_conversions.resolved
+
+
+def test_deferred_errors_surface_at_build():
+    app = Flask(__name__)
+
+    @app.route("/api/broken")
+    @typed(deferred=True)
+    def broken_view() -> UndefinedType:  # noqa: F821
+        return None
+
+    with pytest.raises(NameError):
+        build_ts_api(app)
+    with pytest.raises(NameError):
+        warm_up(app)
+
+    other_app = Flask(__name__)
+
+    @other_app.route("/api/cached_stream")
+    @typed(deferred=True, cache=True)
+    def cached_stream() -> Iterator[str]:
+        yield "hello"
+
+    with pytest.raises(TypeError):
+        build_ts_api(other_app)
+
+
+def test_batch(client):
+    calls = [
+        {"url": "/api/compressed/2"},
+        {"url": "/api/compressed/two"},
+        {"url": "/api/columnar_bars", "method": "GET"},
+        {"url": "/api/floatify", "method": "POST", "body": "#3.5#"},
+        {"url": "/api/stream_bars/2"},
+        {"url": "/api/missing"},
+        {"method": "GET"},
+        "/api/floatify",
+    ]
+    response = client.post("/api/batch", data=json.dumps(calls), content_type="application/json")
+    assert response.status_code == 200
+    assert response.json == [
+        {"status": 200, "body": ["hello", "hello"]},
+        {"status": 500, "body": None},  # failing calls don't affect the others
+        {"status": 200, "body": {"oneField": ["2020-10-02T00:00:00Z", "2020-10-03T00:00:00Z"]}},
+        {"status": 405, "body": None},  # only GET calls are batched
+        {"status": 400, "body": None},  # streams can't be batched
+        {"status": 404, "body": None},
+        {"status": 400, "body": None},  # malformed calls
+        {"status": 400, "body": None},
+    ]
+
+
+def test_batch_app_context():
+    app = Flask(__name__)
+    init_tsgen(app, batch_url="/batch")
+
+    @app.before_request
+    def count_requests():
+        flask.g.requests = flask.g.get("requests", 0) + 1
+
+    @app.route("/requests")
+    @typed()
+    def requests() -> int:
+        return flask.g.requests
+
+    response = app.test_client().post(
+        "/batch", data=json.dumps([{"url": "/requests"}, {"url": "/requests"}]), content_type="application/json"
+    )
+    assert response.json == [{"status": 200, "body": 1}, {"status": 200, "body": 1}]
+
+
+def test_timing(client, tmp_path):
+    timings = []
+    timing_hooks.append(timings.append)
+    stats_file = str(tmp_path / "stats.json")
+    test_app.config.update(TSGEN_TIMING=True, TSGEN_SERVER_TIMING=True, TSGEN_TIMING_STATS_FILE=stats_file)
+    try:
+        response = client.post("/api/floatify", data=json.dumps("#3.5#"), content_type="application/json")
+        assert response.json == 3.5
+        assert [t.split(";")[0] for t in response.headers["Server-Timing"].split(", ")] == [
+            "load", "parse", "view", "encode"
+        ]
+        assert timings[0].endpoint == "floatify"
+        assert timings[0].request_size == len(json.dumps("#3.5#"))
+        assert timings[0].response_size == len(response.data)
+        assert timing_stats.histograms()["floatify"]["view"].count >= 1
+
+        result = test_app.test_cli_runner().invoke(args=["tsgen", "stats"])
+        assert "floatify" in result.output
+
+        result = test_app.test_cli_runner().invoke(args=["tsgen", "stats", "--reset"])
+        assert "floatify" in result.output
+        assert "Removed 1 stats files" in result.output
+        assert list(tmp_path.iterdir()) == []
+    finally:
+        timing_hooks.remove(timings.append)
+        test_app.config.update(TSGEN_TIMING=False, TSGEN_SERVER_TIMING=False, TSGEN_TIMING_STATS_FILE=None)
+
+    response = client.get("/api/columnar_bars")
+    assert "Server-Timing" not in response.headers
+
+
+def test_streaming_response(client):
+    response = client.get("/api/stream_bars/2")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert response.is_streamed
+    assert [json.loads(line) for line in response.data.decode().splitlines()] == [
+        {"oneField": "2020-10-02T00:00:00Z"},
+        {"oneField": "2020-10-02T01:00:00Z"},
+    ]
+
+
 def test_build_ts_api():
     files = build_ts_api(test_app).get_files()
     assert len(files) == 1
@@ -98,3 +481,17 @@ def test_build_ts_api():
     assert "interface Foo {" in file_contents
     assert "interface Bar {" in file_contents
     assert "const requestResponseEndpoint = async (theFoo: Foo)" in file_contents
+    assert "const columnarBars = (): Promise<Bar[]> => _shared(`/api/columnar_bars`, 5000, async () => {" in file_contents
+    assert "_fromColumns<_BarDto>(dto)" in file_contents
+    assert "'Accept': 'application/x-msgpack'" in file_contents
+    assert "_fromPositional(_unpackMsgpack(await response.arrayBuffer()), [\"o\", [[\"oneField\", null]]])" in file_contents
+    assert "...(cached ? {'If-None-Match': cached.etag} : {})" in file_contents
+    assert "const cached = _cachedETag(`/api/etag_bar`);" in file_contents
+    assert "return _cacheETag(`/api/etag_bar`, response, {oneField: new Date(dto.oneField)});" in file_contents
+    assert "const streamBars = async function* (count: string): AsyncGenerator<Bar>" in file_contents
+    assert "const asyncEndpoint = async (theFoo: Foo): Promise<Bar>" in file_contents
+    assert "await fetch(`/api/batch`" in file_contents
+    assert "for (let i = 0; i < queued.length; i += 100) {" in file_contents
+    assert "const response = await _batchedFetch(`/api/columnar_bars`" in file_contents
+    assert "const response = await fetch(`/api/floatify`" in file_contents
+    assert "const response = await fetch(`/api/etag_bar`" in file_contents
@@ -0,0 +1,123 @@
+"""Type information of typed functions, as used at request time
+
+Kept apart from the typescript code generation in `tsgen.apis`, so serving
+requests doesn't import jinja2 templates and client code builders.
+"""
+import dataclasses
+import threading
+from types import FunctionType
+from typing import Optional, get_type_hints, Callable, Any, Generic, TypeVar
+
+from tsgen.types import get_type_tree, AbstractNode, Stream
+from tsgen.types.columnar import Columnar
+from tsgen.types.codec import compile_parse_dto, compile_create_dto, compile_write_json
+
+
+@dataclasses.dataclass
+class TSGenFunctionInfo:
+    """Used for storing information about functions for later use
+
+    Type hints are (often) easier to evaluate at the point they are declared
+    so instead of storing python types directly, this can be used to store
+    evaluated type trees for functions (see `tsgen.types`) for later use.
+
+    The compiled codecs are flat equivalents of the trees' `create_dto`/`parse_dto`
+    and should be preferred at request time (see `tsgen.types.codec`).
+    """
+    return_type_tree: Optional[AbstractNode]
+    arg_type_trees: dict[str, AbstractNode]
+    return_dto_creator: Optional[Callable[[Any], Any]] = None
+    return_json_writer: Optional[Callable[[Any], str]] = None
+    arg_dto_parsers: dict[str, Callable[[Any], Any]] = dataclasses.field(default_factory=dict)
+    msgpack: bool = False  # if the return value can be sent as msgpack, see `tsgen.msgpack`
+    etag: bool = False  # if responses have ETags and support conditional requests
+    client_cache_ttl: Optional[float] = None  # seconds generated clients may reuse GET results
+
+
+T = TypeVar("T")
+
+
+class Deferred(Generic[T]):
+    """Thread safe evaluation of `factory` on first use
+
+    The factory runs at most once. If it raises, the exception propagates
+    and the next `get()` tries again.
+    """
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._resolved = False
+        self._value: Optional[T] = None
+
+    @property
+    def resolved(self) -> bool:
+        return self._resolved
+
+    def get(self) -> T:
+        if not self._resolved:
+            with self._lock:
+                if not self._resolved:
+                    self._value = self._factory()
+                    self._resolved = True
+        return self._value
+
+
+def prepare_function(
+        func,
+        localns=None,
+        columnar=False,
+        msgpack=False,
+        etag=False,
+        client_cache_ttl: Optional[float] = None,
+        deferred=False,
+    ) -> TSGenFunctionInfo:
+    """Evaluate and attach type trees and codecs for a function's annotations
+
+    :param columnar: Transport a `list[<dataclass>]` return value in columnar form
+        (see `tsgen.types.columnar.Columnar`)
+    :param msgpack: Let clients request the return value as msgpack (see `tsgen.msgpack`)
+    :param etag: Let clients make conditional requests for the return value
+    :param client_cache_ttl: Let generated clients cache GET results for this many seconds
+    :param deferred: Only evaluate the annotations when the info is first used (see `get_prepared_info`),
+        instead of when the function is declared
+    """
+    def create_info():
+        return _create_info(func, localns, columnar, msgpack, etag, client_cache_ttl)
+
+    func.tsgen_info = Deferred(create_info)
+    if not deferred:
+        func.tsgen_info.get()
+    return func
+
+
+def _create_info(func, localns, columnar, msgpack, etag, client_cache_ttl) -> TSGenFunctionInfo:
+    annotations = get_type_hints(func)
+    return_value_py_type = annotations.pop("return", None)
+    return_type_tree = None
+    if return_value_py_type is not None:
+        return_type_tree = get_type_tree(return_value_py_type, localns=localns)
+    if columnar:
+        return_type_tree = Columnar.from_list(return_type_tree)
+
+    arg_type_trees = {n: get_type_tree(t, localns=localns) for n, t in annotations.items()}
+
+    return TSGenFunctionInfo(
+        return_type_tree=return_type_tree,
+        arg_type_trees=arg_type_trees,
+        return_dto_creator=compile_create_dto(return_type_tree) if return_type_tree is not None else None,
+        return_json_writer=compile_write_json(return_type_tree) if return_type_tree is not None else None,
+        arg_dto_parsers={n: compile_parse_dto(t) for n, t in arg_type_trees.items()},
+        msgpack=msgpack and return_type_tree is not None and not isinstance(return_type_tree, Stream),
+        etag=etag and return_type_tree is not None and not isinstance(return_type_tree, Stream),
+        client_cache_ttl=client_cache_ttl,
+    )
+
+
+def get_prepared_info(func: FunctionType) -> TSGenFunctionInfo:
+    """The info of a prepared function, evaluating its annotations if that was deferred"""
+    # noinspection PyUnresolvedReferences
+    return func.tsgen_info.get()
+
+
+def has_prepared_info(func: FunctionType) -> bool:
+    return hasattr(func, "tsgen_info")
@@ -0,0 +1,56 @@
+import json
+import subprocess
+import sys
+import textwrap
+
+RUNTIME_SCRIPT = textwrap.dedent("""
+    import dataclasses
+    import datetime
+    import json
+    import sys
+
+    from tsgen.types import get_type_tree
+
+    @dataclasses.dataclass
+    class Bar:
+        when: datetime.datetime
+
+    tree = get_type_tree(list[Bar])
+    assert tree.parse_dto(tree.create_dto([Bar(datetime.datetime(2020, 1, 1))]))
+    types_modules = set(sys.modules)
+
+    import flask
+    from tsgen.flask_integration import typed, build_ts_api
+
+    app = flask.Flask("runtime")
+
+    @app.route("/bars", methods=["POST"])
+    @typed()
+    def bars(bars: list[Bar]) -> list[Bar]:
+        return bars
+
+    response = app.test_client().post("/bars", json=[{"when": "2020-01-01T00:00:00Z"}])
+    assert response.status_code == 200
+    serving_modules = set(sys.modules)
+
+    build_ts_api(app).get_files()
+    print(json.dumps({
+        "types_modules": sorted(types_modules),
+        "serving_modules": sorted(serving_modules),
+        "build_modules": sorted(sys.modules),
+    }))
+""")
+
+
+def test_runtime_import_footprint():
+    output = subprocess.run(
+        [sys.executable, "-c", RUNTIME_SCRIPT], check=True, capture_output=True, text=True
+    ).stdout
+    result = json.loads(output)
+
+    # the type trees can be used on their own
+    assert "flask" not in result["types_modules"]
+    assert "jinja2" not in result["types_modules"]
+    # serving typed views doesn't load code generation (jinja2 itself is a dependency of flask)
+    assert "tsgen.apis" not in result["serving_modules"]
+    assert "tsgen.apis" in result["build_modules"]
@@ -0,0 +1,220 @@
+"""Per phase timing of typed view requests
+
+Enabled per app using the `TSGEN_TIMING` config value. Every typed request then
+measures how long it spends in each phase:
+
+* `load` decoding the json payload
+* `parse` converting the payload dto to python values
+* `view` the view function itself
+* `encode` converting and serializing the return value (these are fused into a
+  single pass by the compiled codecs, so they are measured together)
+* `cache` looking up a response in the server side cache, for cache hits
+
+Measurements are aggregated into per endpoint histograms in `timing_stats`, and
+passed as `RequestTimings` to any callables registered in `timing_hooks`.
+Set `TSGEN_SERVER_TIMING` to also send them to clients in a `Server-Timing` header,
+and `TSGEN_TIMING_STATS_FILE` to periodically save the histograms for `flask tsgen stats`.
+Every server process saves its own `<stats file>.<pid>` file, which are merged when loaded.
+"""
+import bisect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# upper bounds of histogram buckets, in milliseconds for durations and kilobytes for sizes
+BUCKET_BOUNDS: tuple[float, ...] = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+@dataclass()
+class RequestTimings:
+    endpoint: str
+    phases: dict[str, float] = field(default_factory=dict)  # phase -> seconds
+    request_size: int = 0
+    response_size: Optional[int] = None  # None for streamed responses
+
+
+timing_hooks: list[Callable[[RequestTimings], None]] = []
+
+
+class PhaseTimer:
+    """Measures consecutive phases of a request, each phase ending when it's marked"""
+    def __init__(self, endpoint: str):
+        self.timings = RequestTimings(endpoint)
+        self._last = time.perf_counter()
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.timings.phases[phase] = now - self._last
+        self._last = now
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{phase};dur={seconds * 1000:.3f}" for phase, seconds in self.timings.phases.items())
+
+
+@dataclass()
+class Histogram:
+    counts: list[int] = field(default_factory=lambda: [0] * (len(BUCKET_BOUNDS) + 1))
+    total: float = 0.0
+    max: float = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def add(self, value: float):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, value)] += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket containing the q:th (0-1) percentile"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def merge(self, other: "Histogram"):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def to_json(self) -> dict:
+        return {"counts": self.counts, "total": self.total, "max": self.max}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Histogram":
+        return cls(counts=data["counts"], total=data["total"], max=data["max"])
+
+
+class TimingStats:
+    """Thread safe aggregation of request timings into histograms per endpoint and phase"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: dict[str, dict[str, Histogram]] = {}
+        self._last_save = 0.0
+
+    def record(self, timings: RequestTimings):
+        with self._lock:
+            endpoint_histograms = self._histograms.setdefault(timings.endpoint, {})
+            for phase, seconds in timings.phases.items():
+                endpoint_histograms.setdefault(phase, Histogram()).add(seconds * 1000)
+            if timings.request_size:
+                endpoint_histograms.setdefault("request_kb", Histogram()).add(timings.request_size / 1024)
+            if timings.response_size is not None:
+                endpoint_histograms.setdefault("response_kb", Histogram()).add(timings.response_size / 1024)
+
+    def histograms(self) -> dict[str, dict[str, Histogram]]:
+        with self._lock:
+            return {
+                endpoint: {phase: Histogram.from_json(h.to_json()) for phase, h in phases.items()}
+                for endpoint, phases in self._histograms.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def save(self, path: str):
+        data = {
+            endpoint: {phase: h.to_json() for phase, h in phases.items()}
+            for endpoint, phases in self.histograms().items()
+        }
+        target = Path(path)
+        with tempfile.NamedTemporaryFile(
+                "w", dir=target.parent, prefix=f".{target.name}.", suffix=".tmp", delete=False
+        ) as fp:
+            fp.write(json.dumps(data))
+        os.replace(fp.name, target)
+
+    def save_throttled(self, path: str, interval: float = 5.0):
+        """Save to this process' stats file for `path` if it wasn't saved in the last `interval` seconds
+
+        Called while handling requests, so errors are logged rather than raised.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_save < interval:
+                return
+            self._last_save = now
+        try:
+            self.save(process_stats_file(path))
+        except Exception:
+            logger.exception(f"Failed to save timing stats to {path}")
+
+
+def process_stats_file(path: str) -> str:
+    return f"{path}.{os.getpid()}"
+
+
+timing_stats = TimingStats()
+
+
+def stats_files(path: str) -> list[Path]:
+    """`path` and the files of all processes saving to it (see `process_stats_file`), if they exist
+
+    Files of processes that have exited are kept, so their timings still count.
+    Remove them with `remove_stats_files` to start over.
+    """
+    target = Path(path)
+    files = [target] if target.exists() else []
+    files += sorted(
+        p for p in target.parent.glob(f"{target.name}.*")
+        if p.name[len(target.name) + 1:].isdigit()
+    )
+    return files
+
+
+def remove_stats_files(path: str) -> int:
+    """Remove all stats files of `path`, returning how many were removed
+
+    Running processes save their (cumulative) histograms again, so restart them as well to start over.
+    """
+    files = stats_files(path)
+    for file in files:
+        file.unlink(missing_ok=True)
+    return len(files)
+
+
+def load_histograms(path: str) -> dict[str, dict[str, Histogram]]:
+    """Load histograms saved to `path` and by all processes (see `process_stats_file`), merged"""
+    histograms: dict[str, dict[str, Histogram]] = {}
+    for file in stats_files(path):
+        for endpoint, phases in json.loads(file.read_text()).items():
+            endpoint_histograms = histograms.setdefault(endpoint, {})
+            for phase, h in phases.items():
+                endpoint_histograms.setdefault(phase, Histogram()).merge(Histogram.from_json(h))
+    return histograms
+
+
+def format_histograms(histograms: dict[str, dict[str, Histogram]]) -> str:
+    """Table with count, mean, p50, p95 and max per endpoint and phase
+
+    Durations are in milliseconds and `request_kb`/`response_kb` sizes in kilobytes.
+    """
+    lines = [f"{'endpoint':<30} {'phase':<12} {'count':>8} {'mean':>9} {'p50':>9} {'p95':>9} {'max':>9}"]
+    for endpoint, phases in sorted(histograms.items()):
+        for phase, h in phases.items():
+            lines.append(
+                f"{endpoint:<30} {phase:<12} {h.count:>8} {h.total / max(h.count, 1):>9.3f} "
+                f"{h.percentile(0.5):>9.3f} {h.percentile(0.95):>9.3f} {h.max:>9.3f}"
+            )
+    return "\n".join(lines)
+
+
+def report(timings: RequestTimings, stats_file: Optional[str] = None):
+    timing_stats.record(timings)
+    if stats_file:
+        timing_stats.save_throttled(stats_file)
+    for hook in timing_hooks:
+        hook(timings)
@@ -0,0 +1,69 @@
+import os
+
+from tsgen.instrumentation import (
+    Histogram, TimingStats, RequestTimings, PhaseTimer, load_histograms, format_histograms, remove_stats_files,
+)
+
+
+def test_histogram():
+    histogram = Histogram()
+    for value in (0.05, 0.3, 0.3, 7, 10000):
+        histogram.add(value)
+    assert histogram.count == 5
+    assert histogram.max == 10000
+    assert histogram.percentile(0.5) == 0.5
+    assert histogram.percentile(0.8) == 10
+    assert histogram.percentile(1) == 10000
+
+
+def test_phase_timer():
+    timer = PhaseTimer("endpoint")
+    timer.mark("parse")
+    timer.mark("view")
+    assert list(timer.timings.phases) == ["parse", "view"]
+    assert timer.server_timing().startswith("parse;dur=")
+
+
+def test_timing_stats(tmp_path):
+    stats = TimingStats()
+    stats.record(RequestTimings("endpoint", {"view": 0.002, "encode": 0.0001}, request_size=0, response_size=2048))
+    stats.record(RequestTimings("endpoint", {"view": 0.004}))
+    histograms = stats.histograms()
+    assert histograms["endpoint"]["view"].count == 2
+    assert histograms["endpoint"]["encode"].count == 1
+    assert histograms["endpoint"]["response_kb"].total == 2
+    assert "request_kb" not in histograms["endpoint"]
+
+    stats_file = str(tmp_path / "stats.json")
+    stats.save(stats_file)
+    assert load_histograms(stats_file) == histograms
+    table = format_histograms(histograms)
+    assert len(table.splitlines()) == 4
+    assert "response_kb" in table
+
+    stats.reset()
+    assert stats.histograms() == {}
+
+
+def test_process_stats_files(tmp_path, monkeypatch):
+    stats_file = str(tmp_path / "stats.json")
+    for pid in (100, 200):
+        stats = TimingStats()
+        stats.record(RequestTimings("endpoint", {"view": 0.002 * pid / 100}))
+        monkeypatch.setattr(os, "getpid", lambda: pid)
+        stats.save_throttled(stats_file)
+        stats.save_throttled(stats_file)  # throttled
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["stats.json.100", "stats.json.200"]
+    view = load_histograms(stats_file)["endpoint"]["view"]
+    assert view.count == 2
+    assert view.max == 4
+
+    assert remove_stats_files(stats_file) == 2
+    assert list(tmp_path.iterdir()) == []
+    assert load_histograms(stats_file) == {}
+
+
+def test_save_errors_are_not_raised(tmp_path):
+    stats = TimingStats()
+    stats.save_throttled(str(tmp_path / "missing_dir" / "stats.json"))
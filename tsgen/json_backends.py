@@ -0,0 +1,85 @@
+"""Encoding and decoding of json payloads for typed views
+
+The stdlib json module is always available. If an accelerated encoder is
+installed it is used by default instead. The backend can be chosen per app
+using the `TSGEN_JSON_BACKEND` config value or per view with
+`typed(json_backend=...)`, either as a name or as a `JsonBackend` instance.
+"""
+import json
+from typing import Any, Optional, Union
+
+from tsgen.types.codec import Codec
+
+
+class JsonBackend:
+    name: str
+
+    def dumps(self, obj: Any) -> bytes:
+        raise NotImplementedError(repr(self))
+
+    def loads(self, data: bytes) -> Any:
+        """Decode json, raising a `ValueError` (e.g. `json.JSONDecodeError`) if it's invalid"""
+        raise NotImplementedError(repr(self))
+
+    def dumps_typed(self, pystruct: Any, create_dto: Codec, write_json: Codec) -> bytes:
+        """Encode a python value using the compiled codecs of its type tree
+
+        By default the dto is created and then encoded, but backends that
+        produce json text in python can use the single pass `write_json` instead.
+        """
+        return self.dumps(create_dto(pystruct))
+
+
+class StdlibJsonBackend(JsonBackend):
+    name = "stdlib"
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf8")
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+    def dumps_typed(self, pystruct: Any, create_dto: Codec, write_json: Codec) -> bytes:
+        return write_json(pystruct).encode("utf8")
+
+
+class OrjsonBackend(JsonBackend):
+    name = "orjson"
+
+    def __init__(self):
+        import orjson  # optional dependency
+        self._orjson = orjson
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._orjson.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self._orjson.loads(data)
+
+
+BACKEND_CLASSES: dict[str, type[JsonBackend]] = {
+    StdlibJsonBackend.name: StdlibJsonBackend,
+    OrjsonBackend.name: OrjsonBackend,
+}
+
+_backends: dict[Optional[str], JsonBackend] = {}
+
+
+def get_json_backend(backend: Union[str, JsonBackend, None] = None) -> JsonBackend:
+    """Get a json backend by name, or the fastest available one if None"""
+    if isinstance(backend, JsonBackend):
+        return backend
+    if backend in _backends:
+        return _backends[backend]
+
+    if backend is None:
+        try:
+            instance = get_json_backend(OrjsonBackend.name)
+        except ImportError:
+            instance = get_json_backend(StdlibJsonBackend.name)
+    elif backend in BACKEND_CLASSES:
+        instance = BACKEND_CLASSES[backend]()
+    else:
+        raise ValueError(f"Unknown json backend {backend!r}, expected one of {list(BACKEND_CLASSES)}")
+    _backends[backend] = instance
+    return instance
@@ -0,0 +1,35 @@
+import pytest
+
+from tsgen.json_backends import get_json_backend, StdlibJsonBackend, JsonBackend
+
+
+def test_stdlib_compact_bytes():
+    backend = get_json_backend("stdlib")
+    assert backend.dumps({"a": [1, "ö"]}) == '{"a":[1,"ö"]}'.encode("utf8")
+    assert backend.loads(b'{"a": [1]}') == {"a": [1]}
+
+
+def test_default_backend():
+    assert isinstance(get_json_backend(), JsonBackend)
+    assert get_json_backend() is get_json_backend()
+
+
+def test_orjson_backend():
+    pytest.importorskip("orjson")
+    backend = get_json_backend("orjson")
+    assert backend.loads(backend.dumps({"a": [1, None]})) == {"a": [1, None]}
+
+
+def test_instance_passthrough():
+    backend = StdlibJsonBackend()
+    assert get_json_backend(backend) is backend
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        get_json_backend("nope")
+
+
+def test_stdlib_dumps_typed_uses_writer():
+    backend = get_json_backend("stdlib")
+    assert backend.dumps_typed(1, create_dto=None, write_json=lambda v: "[%s]" % v) == b"[1]"
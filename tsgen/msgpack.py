@@ -0,0 +1,291 @@
+"""Compact binary transport of dtos using the MessagePack format
+
+Since the structure of every value is known from its type tree on both sides,
+objects are encoded as arrays of field values in declaration order instead of
+maps, so no field names are sent. A *wire schema* derived from the type tree
+(see `wire_schema`) tells the generated typescript client how to restore the
+keys before the regular dto parsing.
+
+Only the subset of MessagePack needed for json compatible values is supported.
+"""
+import struct
+from typing import Any, Optional
+
+from tsgen.types import AbstractNode, Object, List, Dict, Tuple, Nullable
+from tsgen.types.columnar import Columnar
+from tsgen.formatting import to_camel
+
+MSGPACK_MIMETYPE = "application/x-msgpack"
+
+_pack_float = struct.Struct(">Bd").pack
+
+
+def packb(obj: Any) -> bytes:
+    buffer = bytearray()
+    _pack(obj, buffer)
+    return bytes(buffer)
+
+
+def _pack(obj: Any, buffer: bytearray):
+    t = type(obj)
+    if t is str:
+        data = obj.encode("utf8")
+        n = len(data)
+        if n < 32:
+            buffer.append(0xa0 | n)
+        elif n < 0x100:
+            buffer += b"\xd9" + n.to_bytes(1, "big")
+        elif n < 0x10000:
+            buffer += b"\xda" + n.to_bytes(2, "big")
+        else:
+            buffer += b"\xdb" + n.to_bytes(4, "big")
+        buffer += data
+    elif t is int:
+        _pack_int(obj, buffer)
+    elif t is float:
+        buffer += _pack_float(0xcb, obj)
+    elif obj is None:
+        buffer.append(0xc0)
+    elif obj is True:
+        buffer.append(0xc3)
+    elif obj is False:
+        buffer.append(0xc2)
+    elif t is list or t is tuple:
+        _pack_header(len(obj), 0x90, b"\xdc", b"\xdd", buffer)
+        for item in obj:
+            _pack(item, buffer)
+    elif t is dict:
+        _pack_header(len(obj), 0x80, b"\xde", b"\xdf", buffer)
+        for key, value in obj.items():
+            _pack(key, buffer)
+            _pack(value, buffer)
+    elif isinstance(obj, int):
+        _pack_int(int(obj), buffer)
+    elif isinstance(obj, float):
+        buffer += _pack_float(0xcb, float(obj))
+    else:
+        raise TypeError(f"Can't pack value of type {t}")
+
+
+def _pack_int(i: int, buffer: bytearray):
+    if 0 <= i < 0x80:
+        buffer.append(i)
+    elif -32 <= i < 0:
+        buffer.append(i & 0xff)
+    elif i >= 0:
+        for prefix, size in ((b"\xcc", 1), (b"\xcd", 2), (b"\xce", 4), (b"\xcf", 8)):
+            if i < 1 << (8 * size):
+                buffer += prefix + i.to_bytes(size, "big")
+                return
+        raise OverflowError(f"Integer {i} is too large for msgpack")
+    else:
+        for prefix, size in ((b"\xd0", 1), (b"\xd1", 2), (b"\xd2", 4), (b"\xd3", 8)):
+            if i >= -(1 << (8 * size - 1)):
+                buffer += prefix + i.to_bytes(size, "big", signed=True)
+                return
+        raise OverflowError(f"Integer {i} is too small for msgpack")
+
+
+def _pack_header(n: int, fix_prefix: int, prefix16: bytes, prefix32: bytes, buffer: bytearray):
+    if n < 16:
+        buffer.append(fix_prefix | n)
+    elif n < 0x10000:
+        buffer += prefix16 + n.to_bytes(2, "big")
+    else:
+        buffer += prefix32 + n.to_bytes(4, "big")
+
+
+def unpackb(data: bytes) -> Any:
+    value, offset = _unpack(memoryview(data), 0)
+    if offset != len(data):
+        raise ValueError("Extra data after msgpack value")
+    return value
+
+
+def _unpack(data: memoryview, offset: int) -> tuple[Any, int]:
+    b = data[offset]
+    offset += 1
+    if b < 0x80:
+        return b, offset
+    if b >= 0xe0:
+        return b - 0x100, offset
+    if 0xa0 <= b <= 0xbf:
+        return _unpack_str(data, offset, b & 0x1f)
+    if 0x90 <= b <= 0x9f:
+        return _unpack_array(data, offset, b & 0x0f)
+    if 0x80 <= b <= 0x8f:
+        return _unpack_map(data, offset, b & 0x0f)
+    if b == 0xc0:
+        return None, offset
+    if b == 0xc2:
+        return False, offset
+    if b == 0xc3:
+        return True, offset
+    if b == 0xca:
+        return struct.unpack_from(">f", data, offset)[0], offset + 4
+    if b == 0xcb:
+        return struct.unpack_from(">d", data, offset)[0], offset + 8
+    if 0xcc <= b <= 0xd3:
+        size = 1 << ((b - 0xcc) % 4)
+        signed = b >= 0xd0
+        return int.from_bytes(data[offset:offset + size], "big", signed=signed), offset + size
+    if 0xd9 <= b <= 0xdb:
+        size = 1 << (b - 0xd9)
+        return _unpack_str(data, offset + size, int.from_bytes(data[offset:offset + size], "big"))
+    if b in (0xdc, 0xdd):
+        size = 2 if b == 0xdc else 4
+        return _unpack_array(data, offset + size, int.from_bytes(data[offset:offset + size], "big"))
+    if b in (0xde, 0xdf):
+        size = 2 if b == 0xde else 4
+        return _unpack_map(data, offset + size, int.from_bytes(data[offset:offset + size], "big"))
+    raise ValueError(f"Unsupported msgpack type byte {b:#x}")
+
+
+def _unpack_str(data: memoryview, offset: int, n: int) -> tuple[str, int]:
+    return str(data[offset:offset + n], "utf8"), offset + n
+
+
+def _unpack_array(data: memoryview, offset: int, n: int) -> tuple[list, int]:
+    result = []
+    for _ in range(n):
+        item, offset = _unpack(data, offset)
+        result.append(item)
+    return result, offset
+
+
+def _unpack_map(data: memoryview, offset: int, n: int) -> tuple[dict, int]:
+    result = {}
+    for _ in range(n):
+        key, offset = _unpack(data, offset)
+        result[key], offset = _unpack(data, offset)
+    return result, offset
+
+
+def wire_schema(node: AbstractNode) -> Optional[list]:
+    """Json compatible description of where a tree has positional objects
+
+    * `["o", [[<key>, <schema>], ...]]` an object encoded as an array of field values
+    * `["l", <schema>]`, `["d", <schema>]` lists and string keyed dicts
+    * `["t", [<schema>, ...]]` tuples
+    * `None` for values that are transported as is
+
+    Nulls are allowed anywhere. This must match the output of
+    `compile_create_dto(node, positional_objects=True)`.
+    """
+    if isinstance(node, Object):
+        return ["o", [[to_camel(name), wire_schema(sub_node)] for name, sub_node in node.fields.items()]]
+    if isinstance(node, Columnar):
+        return ["o", [[to_camel(name), ["l", wire_schema(sub_node)]] for name, sub_node in node.element_node.fields.items()]]
+    if isinstance(node, List):
+        sub_schema = wire_schema(node.element_node)
+        return sub_schema and ["l", sub_schema]
+    if isinstance(node, Dict):
+        sub_schema = wire_schema(node.value_type)
+        return sub_schema and ["d", sub_schema]
+    if isinstance(node, Tuple):
+        sub_schemas = [wire_schema(sub_node) for sub_node in node.fields]
+        return ["t", sub_schemas] if any(sub_schemas) else None
+    if isinstance(node, Nullable):
+        return wire_schema(node.subtype)
+    return None
+
+
+TS_UNPACK_MSGPACK = """
+const _unpackMsgpack = (buffer: ArrayBuffer): any => {
+  const view = new DataView(buffer);
+  const decoder = new TextDecoder();
+  let offset = 0;
+  const str = (n: number): string => {
+    const s = decoder.decode(new Uint8Array(buffer, offset, n));
+    offset += n;
+    return s;
+  };
+  const array = (n: number): any[] => {
+    const result = [];
+    for (let i = 0; i < n; i++) {
+      result.push(read());
+    }
+    return result;
+  };
+  const map = (n: number): { [key: string]: any } => {
+    const result: { [key: string]: any } = {};
+    for (let i = 0; i < n; i++) {
+      const key = read();
+      result[key] = read();
+    }
+    return result;
+  };
+  const uint = (size: number): number => {
+    let n = 0;
+    for (let i = 0; i < size; i++) {
+      n = n * 256 + view.getUint8(offset++);
+    }
+    return n;
+  };
+  const int = (size: number): number => {
+    const n = uint(size);
+    return n >= 2 ** (8 * size - 1) ? n - 2 ** (8 * size) : n;
+  };
+  const read = (): any => {
+    const b = view.getUint8(offset++);
+    if (b < 0x80) return b;
+    if (b >= 0xe0) return b - 0x100;
+    if (b >= 0xa0 && b <= 0xbf) return str(b & 0x1f);
+    if (b >= 0x90 && b <= 0x9f) return array(b & 0x0f);
+    if (b >= 0x80 && b <= 0x8f) return map(b & 0x0f);
+    switch (b) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xca: offset += 4; return view.getFloat32(offset - 4);
+      case 0xcb: offset += 8; return view.getFloat64(offset - 8);
+      case 0xcc: return uint(1);
+      case 0xcd: return uint(2);
+      case 0xce: return uint(4);
+      case 0xcf: return uint(8);
+      case 0xd0: return int(1);
+      case 0xd1: return int(2);
+      case 0xd2: return int(4);
+      case 0xd3: return int(8);
+      case 0xd9: return str(uint(1));
+      case 0xda: return str(uint(2));
+      case 0xdb: return str(uint(4));
+      case 0xdc: return array(uint(2));
+      case 0xdd: return array(uint(4));
+      case 0xde: return map(uint(2));
+      case 0xdf: return map(uint(4));
+    }
+    throw new Error("Unsupported msgpack type byte " + b);
+  };
+  return read();
+}
+"""
+
+TS_FROM_POSITIONAL = """
+const _fromPositional = (value: any, schema: any): any => {
+  if (value === null || schema === null) {
+    return value;
+  }
+  const [kind, sub] = schema;
+  switch (kind) {
+    case 'o': {
+      const result: { [key: string]: any } = {};
+      sub.forEach(([key, fieldSchema]: [string, any], i: number) => {
+        result[key] = _fromPositional(value[i], fieldSchema);
+      });
+      return result;
+    }
+    case 'l':
+      return value.map((item: any) => _fromPositional(item, sub));
+    case 'd': {
+      const result: { [key: string]: any } = {};
+      Object.keys(value).forEach((key) => {
+        result[key] = _fromPositional(value[key], sub);
+      });
+      return result;
+    }
+    case 't':
+      return value.map((item: any, i: number) => _fromPositional(item, sub[i]));
+  }
+}
+"""
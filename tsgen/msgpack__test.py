@@ -0,0 +1,46 @@
+import datetime
+from dataclasses import dataclass
+from typing import Optional
+
+import pytest
+
+from tsgen.msgpack import packb, unpackb, wire_schema
+from tsgen.types import get_type_tree
+from tsgen.types.codec import compile_create_dto
+
+
+@pytest.mark.parametrize("value", [
+    None, True, False, 0, 127, 128, -1, -32, -33, 255, 65536, 2 ** 40, -2 ** 40, 1.5, "", "ö" * 40, "x" * 70000,
+    list(range(20)), {"a": [1, None], "b": {}}, [[]] * 70000,
+])
+def test_roundtrip(value):
+    assert unpackb(packb(value)) == value
+
+
+def test_known_encodings():
+    assert packb({"a": [1, -1, None, True]}) == b"\x81\xa1a\x94\x01\xff\xc0\xc3"
+    assert packb(1.0) == b"\xcb?\xf0\x00\x00\x00\x00\x00\x00"
+
+
+@dataclass
+class Point:
+    x_pos: int
+    label: Optional[str]
+
+
+@dataclass
+class Chart:
+    points: list[Point]
+    when: datetime.datetime
+
+
+def test_positional_objects():
+    tree = get_type_tree(Chart)
+    create = compile_create_dto(tree, positional_objects=True)
+    chart = Chart([Point(1, "a"), Point(2, None)], datetime.datetime(2021, 4, 25))
+    assert create(chart) == [[[1, "a"], [2, None]], "2021-04-25T00:00:00Z"]
+    assert wire_schema(tree) == ["o", [
+        ["points", ["l", ["o", [["xPos", None], ["label", None]]]]],
+        ["when", None],
+    ]]
+    assert wire_schema(get_type_tree(list[int])) is None
@@ -0,0 +1,89 @@
+"""Server side memoization of encoded typed view responses
+
+Enabled per view with `typed(cache=...)`, either as `True` for default settings
+or as a `ResponseCache` instance. Responses are cached after encoding but before
+ETags and compression are applied, so a hit skips payload parsing, the view
+function and all dto conversion.
+
+Only GET requests are cached, so this is meant for views that are pure functions
+of their url arguments. Cached entries can be dropped using `ResponseCache.invalidate`.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Hashable, Optional, Any
+
+
+@dataclass()
+class ResponseCache:
+    """Bounded LRU cache with optional expiry of entries
+
+    Entries are keyed by endpoint, url arguments, the negotiated response format and
+    the values of any `vary_headers`. An instance can be shared between views that
+    should be invalidated together.
+    """
+    max_entries: int = 1024
+    ttl: Optional[float] = None  # seconds until an entry expires, None to keep entries until evicted
+    vary_headers: tuple[str, ...] = ()
+
+    hits: int = field(default=0, init=False)
+    misses: int = field(default=0, init=False)
+
+    def __post_init__(self):
+        self._entries: OrderedDict[Hashable, tuple[Optional[float], Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, endpoint: str, url_args: dict[str, Any], variant: Hashable, headers) -> Hashable:
+        return (
+            endpoint,
+            tuple(sorted(url_args.items())),
+            variant,
+            tuple(headers.get(name) for name in self.vary_headers),
+        )
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any):
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, endpoint: Optional[str] = None, /, **url_args):
+        """Remove all entries for an endpoint and/or matching the given url arguments
+
+        Without arguments the whole cache is cleared.
+        """
+        with self._lock:
+            for key in list(self._entries):
+                key_endpoint, key_url_args = key[0], dict(key[1])
+                if endpoint is not None and key_endpoint != endpoint:
+                    continue
+                if all(key_url_args.get(name) == value for name, value in url_args.items()):
+                    del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def get_response_cache(setting) -> Optional[ResponseCache]:
+    """Normalize a cache setting (None, bool or ResponseCache)"""
+    if setting is True:
+        return ResponseCache()
+    if setting is False:
+        return None
+    return setting  # not `setting or None`, an empty cache is falsy
@@ -0,0 +1,73 @@
+from unittest import mock
+
+from tsgen.response_cache import ResponseCache, get_response_cache
+
+
+def test_get_response_cache():
+    assert get_response_cache(None) is None
+    assert get_response_cache(False) is None
+    assert isinstance(get_response_cache(True), ResponseCache)
+    cache = ResponseCache()
+    assert get_response_cache(cache) is cache
+
+
+def test_hits_and_misses():
+    cache = ResponseCache()
+    key = cache.key("endpoint", {"id": "1"}, False, {})
+    assert cache.get(key) is None
+    cache.set(key, b"1")
+    assert cache.get(cache.key("endpoint", {"id": "1"}, False, {})) == b"1"
+    assert cache.get(cache.key("endpoint", {"id": "1"}, True, {})) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+
+def test_ttl():
+    cache = ResponseCache(ttl=10)
+    with mock.patch("time.monotonic", return_value=100):
+        cache.set("a", 1)
+    with mock.patch("time.monotonic", return_value=109):
+        assert cache.get("a") == 1
+    with mock.patch("time.monotonic", return_value=111):
+        assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_vary_headers():
+    cache = ResponseCache(vary_headers=("Accept-Language",))
+    cache.set(cache.key("endpoint", {}, False, {"Accept-Language": "en"}), b"en")
+    assert cache.get(cache.key("endpoint", {}, False, {"Accept-Language": "sv"})) is None
+    assert cache.get(cache.key("endpoint", {}, False, {"Accept-Language": "en"})) == b"en"
+
+
+def test_invalidate():
+    cache = ResponseCache()
+    for endpoint in ("first", "second"):
+        for i in ("1", "2"):
+            cache.set(cache.key(endpoint, {"id": i}, False, {}), b"")
+    cache.invalidate("first", id="1")
+    assert len(cache) == 3
+    cache.invalidate(id="2")
+    assert len(cache) == 1
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_invalidate_url_arg_named_endpoint():
+    cache = ResponseCache()
+    for name in ("a", "b"):
+        cache.set(cache.key("view", {"endpoint": name}, False, {}), b"")
+    cache.invalidate(endpoint="a")
+    assert len(cache) == 1
+    cache.invalidate("view", endpoint="b")
+    assert len(cache) == 0
@@ -0,0 +1,85 @@
+"""Shared jinja2 environment for rendering typescript code
+
+Templates are compiled once per process and kept in memory, and their compiled
+bytecode is cached on disk between builds (in the directory given by the
+`TSGEN_TEMPLATE_CACHE_DIR` environment variable, or a per-user temp directory).
+
+The default templates are defined by the modules using them and are listed here by
+name, e.g. `"function.ts"`, so they can be overridden before those modules are
+imported (`typed()` doesn't import the code generation modules). To customize
+generated code, e.g. to use axios instead of fetch, override a template by name
+with `override_template`, or put files with the same names in the directory given
+by the `TSGEN_TEMPLATE_DIR` environment variable. Overridden templates are cached
+like the defaults.
+
+jinja2 is only imported when a template is first rendered.
+"""
+import hashlib
+import importlib
+import os
+from functools import lru_cache
+from typing import Optional
+
+# name -> (module, attribute) of the default template source
+DEFAULT_TEMPLATES: dict[str, tuple[str, str]] = {
+    "file.ts": ("tsgen.apis", "TS_FILE_PATTERN"),
+    "function.ts": ("tsgen.apis", "TS_FUNC_TEMPLATE"),
+    "stream_function.ts": ("tsgen.apis", "TS_STREAM_FUNC_TEMPLATE"),
+    "batched_fetch.ts": ("tsgen.apis", "TS_BATCHED_FETCH"),
+    "interface.ts": ("tsgen.types.object", "TS_INTERFACE_TEMPLATE"),
+}
+_overrides: dict[str, str] = {}
+
+
+def override_template(name: str, source: Optional[str]):
+    """Use `source` instead of the default template `name`, or the default again if `source` is None"""
+    if name not in DEFAULT_TEMPLATES:
+        raise KeyError(f"Unknown template {name!r}, available templates: {sorted(DEFAULT_TEMPLATES)}")
+    if source is None:
+        _overrides.pop(name, None)
+    else:
+        _overrides[name] = source
+    get_environment.cache_clear()  # templates compiled from the previous source are cached in the environment
+
+
+def default_template_source(name: str) -> Optional[str]:
+    if name not in DEFAULT_TEMPLATES:
+        return None
+    module, attribute = DEFAULT_TEMPLATES[name]
+    return getattr(importlib.import_module(module), attribute)
+
+
+@lru_cache(maxsize=None)
+def get_environment():
+    """The `jinja2.Environment` used for all templates
+
+    Call `get_environment.cache_clear()` after changing `TSGEN_TEMPLATE_DIR`.
+    """
+    import jinja2
+
+    cache_dir = os.environ.get("TSGEN_TEMPLATE_CACHE_DIR")
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    loaders = [jinja2.DictLoader(_overrides)]
+    if template_dir := os.environ.get("TSGEN_TEMPLATE_DIR"):
+        loaders.append(jinja2.FileSystemLoader(template_dir))
+    loaders.append(jinja2.FunctionLoader(default_template_source))
+    return jinja2.Environment(
+        loader=jinja2.ChoiceLoader(loaders),
+        bytecode_cache=jinja2.FileSystemBytecodeCache(cache_dir or None),
+        cache_size=-1,  # never evict compiled templates
+    )
+
+
+def templates_fingerprint() -> str:
+    """Hash of the sources of all templates in use, including overrides"""
+    environment = get_environment()
+    h = hashlib.sha256()
+    for name in sorted(DEFAULT_TEMPLATES):
+        source, _, _ = environment.loader.get_source(environment, name)
+        h.update(f"{name}\0{source}\0".encode())
+    return h.hexdigest()
+
+
+def render(template_name: str, /, **context) -> str:
+    return get_environment().get_template(template_name).render(context)
@@ -0,0 +1,55 @@
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from tsgen.templates import get_environment, override_template, render
+
+
+@pytest.fixture
+def template_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("TSGEN_TEMPLATE_CACHE_DIR", str(tmp_path / "cache"))
+    get_environment.cache_clear()
+    yield tmp_path / "cache"
+    get_environment.cache_clear()
+
+
+def test_compiled_once(template_cache_dir):
+    assert get_environment().get_template("file.ts") is get_environment().get_template("file.ts")
+    assert render("file.ts", entities=["a", "b"]) == "// Generated source code - do not modify this file\na\n\nb\n"
+    assert len(list(template_cache_dir.iterdir())) == 1  # bytecode cached on disk
+
+
+def test_override_template(template_cache_dir):
+    template = get_environment().get_template("file.ts")
+    override_template("file.ts", "// custom{% for entity in entities %} {{entity}}{% endfor %}")
+    try:
+        assert render("file.ts", entities=["a", "b"]) == "// custom a b"
+        assert get_environment().get_template("file.ts") is get_environment().get_template("file.ts")
+    finally:
+        override_template("file.ts", None)
+    assert render("file.ts", entities=[]) == template.render(entities=[])
+
+    with pytest.raises(KeyError):
+        override_template("no_such_template.ts", "")
+
+
+def test_template_dir(tmp_path, template_cache_dir, monkeypatch):
+    (tmp_path / "file.ts").write_text("// from file")
+    monkeypatch.setenv("TSGEN_TEMPLATE_DIR", str(tmp_path))
+    get_environment.cache_clear()
+    assert render("file.ts", entities=[]) == "// from file"
+    assert render("interface.ts", name="Foo", fields=[], prefix="") == "interface Foo {\n}"
+
+
+def test_override_before_code_generation_is_imported():
+    script = textwrap.dedent("""
+        import sys
+        import tsgen.flask_integration
+        from tsgen.templates import override_template
+
+        override_template("function.ts", "// custom")
+        assert "tsgen.apis" not in sys.modules
+    """)
+    subprocess.run([sys.executable, "-c", script], check=True)
@@ -1,11 +1,36 @@
 from __future__ import annotations
+import functools
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Callable, ClassVar
 
 from tsgen.code_snippet_context import CodeSnippetContext
+from tsgen.types.codec import CodecContext, json_dumps, json_bool, json_str, json_int, json_float
+
+
+def cached_dto_tree(dto_tree: Callable[[AbstractNode], AbstractNode]):
+    """Decorator for `dto_tree` implementations, only building the dto tree once per node
+
+    Nodes are shared by all uses of a type (see `tsgen.types.typetree.get_type_tree`),
+    so this saves rebuilding the dto tree for every endpoint using it.
+    """
+    @functools.wraps(dto_tree)
+    def wrapper(self):
+        try:
+            return self.__dict__["_dto_tree"]
+        except KeyError:
+            result = self.__dict__["_dto_tree"] = dto_tree(self)
+            return result
+
+    return wrapper
 
 
 class AbstractNode:
+    # Python types this node class can match, used to only try relevant node classes (see `TypeRegistry`):
+    match_types: ClassVar[tuple] = ()  # exact types, e.g. `int`
+    match_origins: ClassVar[tuple] = ()  # origins of generic types, e.g. `list` for `list[int]`
+    match_dataclasses: ClassVar[bool] = False
+    # node classes without any of the above are tried for every type
+
     @classmethod
     def match(cls, pytype: type, localns=None) -> Optional[AbstractNode]:
         raise NotImplementedError(repr(cls))
@@ -28,6 +53,38 @@ class AbstractNode:
     def dto_tree(self) -> AbstractNode:
         raise NotImplementedError(repr(self))
 
+    def parse_dto_batch(self, structs) -> list:
+        """Parse a whole sequence of dtos, e.g. the items of a list
+
+        Override for node types that can convert many values faster in one go.
+        """
+        return [self.parse_dto(struct) for struct in structs]
+
+    def create_dto_batch(self, pystructs) -> list:
+        return [self.create_dto(pystruct) for pystruct in pystructs]
+
+    def py_parse_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        """Python source expression for parsing the dto in `py_expression`
+
+        Used to compile flat conversion functions (see `tsgen.types.codec`).
+        Falls back to calling `parse_dto` on the node itself.
+        """
+        return f"{ctx.bind('parse', self.parse_dto)}({py_expression})"
+
+    def py_create_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        """Python source expression for creating a dto from `py_expression`
+
+        Falls back to calling `create_dto` on the node itself.
+        """
+        return f"{ctx.bind('create', self.create_dto)}({py_expression})"
+
+    def py_write_json(self, ctx: CodecContext, py_expression: str) -> str:
+        """Python source expression for the json text of the dto of `py_expression`
+
+        Falls back to json encoding the result of `create_dto`.
+        """
+        return f"{ctx.bind('dumps', json_dumps)}({self.py_create_dto(ctx, py_expression)})"
+
 
 PRIMITIVE_TYPES: dict[type, str] = {
     str: "string",
@@ -42,6 +99,8 @@ class Primitive(AbstractNode):
     """Directly json compatible types of a "leaf" character in a type tree"""
     pytype: type
 
+    match_types = tuple(PRIMITIVE_TYPES)
+
     @classmethod
     def match(cls, pytype: type, localns=None) -> Optional[AbstractNode]:
         if pytype in PRIMITIVE_TYPES:
@@ -65,6 +124,16 @@ class Primitive(AbstractNode):
     def ts_parse_dto(self, ctx: CodeSnippetContext, ts_expression: str) -> str:
         return ts_expression
 
+    def py_parse_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        return f"{ctx.bind(self.pytype.__name__, self.pytype)}({py_expression})"
+
+    def py_create_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        return py_expression
+
+    def py_write_json(self, ctx: CodecContext, py_expression: str) -> str:
+        writer = {bool: json_bool, str: json_str, int: json_int, float: json_float}[self.pytype]
+        return f"{ctx.bind(writer.__name__, writer)}({py_expression})"
+
 
 class UnsupportedTypeError(Exception):
     def __init__(self, pytype):
@@ -0,0 +1,129 @@
+"""Compilation of type trees into flat python conversion functions
+
+Walking a type tree on every request means a chain of virtual calls per
+value. Instead, each node can emit python *source expressions* for its
+conversions (`AbstractNode.py_parse_dto`/`py_create_dto`), in the same way
+it emits typescript expressions for the client. The expressions are glued
+together into a single generated function which is compiled once and then
+reused for every request.
+
+Expressions passed into `py_parse_dto`/`py_create_dto` are always cheap
+side-effect free references (local names, attribute lookups or subscripts)
+so nodes are free to evaluate them more than once.
+"""
+import itertools
+import json
+import math
+from json.encoder import encode_basestring
+from typing import Any, Callable, Hashable, Optional
+
+Codec = Callable[[Any], Any]
+
+
+def json_dumps(obj) -> str:
+    """Compact json encoding of a dto, used for nodes without `py_write_json` support"""
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def json_str(s: str) -> str:
+    if type(s) is str:
+        return encode_basestring(s)
+    return json_dumps(s)  # mistyped values are encoded like the json module would
+
+
+def json_bool(b: bool) -> str:
+    if b is True:
+        return "true"
+    if b is False:
+        return "false"
+    return json_dumps(b)
+
+
+def json_int(i: int) -> str:
+    if type(i) is int:
+        return int.__repr__(i)
+    return json_dumps(i)
+
+
+def json_float(f: float) -> str:
+    if isinstance(f, float) and math.isfinite(f):
+        return float.__repr__(f)
+    return json_dumps(f)
+
+
+class CodecContext:
+    """Keep track of helper functions and bound values for a generated codec
+
+    With `positional_objects` set, object dtos are created as lists of field
+    values in declaration order instead of dicts (see `tsgen.msgpack`).
+    """
+    def __init__(self, positional_objects: bool = False):
+        self.positional_objects = positional_objects
+        self._namespace: dict[str, Any] = {}
+        self._functions: list[str] = []
+        self._memo: dict[Hashable, str] = {}
+        self._counter = itertools.count()
+
+    def fresh_name(self, prefix: str) -> str:
+        """Get a unique local variable name for use in generated code"""
+        return f"_{prefix}{next(self._counter)}"
+
+    def bind(self, prefix: str, value: Any) -> str:
+        """Make a python value available to generated code under a unique name"""
+        key = ("bind", id(value))
+        if key not in self._memo:
+            name = self.fresh_name(prefix)
+            self._namespace[name] = value
+            self._memo[key] = name
+        return self._memo[key]
+
+    def function(self, prefix: str, key: Optional[Hashable], body: Callable[[str], str]) -> str:
+        """Declare a single argument helper function and get its name
+
+        :param prefix: Human readable part of the function name
+        :param key: Helpers with the same (non-None) key are only declared once
+        :param body: Callable taking the argument name and returning the return expression
+        """
+        if key is not None and key in self._memo:
+            return self._memo[key]
+        name = self.fresh_name(prefix)
+        if key is not None:
+            self._memo[key] = name
+        arg_name = self.fresh_name("v")
+        self._functions.append(f"def {name}({arg_name}):\n    return {body(arg_name)}\n")
+        return name
+
+    def source(self) -> str:
+        return "\n".join(self._functions)
+
+    def build(self, entry_name: str) -> Codec:
+        namespace = dict(self._namespace)
+        exec(compile(self.source(), f"<tsgen codec {entry_name}>", "exec"), namespace)
+        codec = namespace[entry_name]
+        codec.__tsgen_source__ = self.source()
+        return codec
+
+
+def _compile(node, method_name: str, ctx: Optional[CodecContext] = None) -> Codec:
+    ctx = ctx or CodecContext()
+    entry_name = ctx.function(method_name[len("py_"):], None, lambda arg: getattr(node, method_name)(ctx, arg))
+    return ctx.build(entry_name)
+
+
+def compile_parse_dto(node) -> Codec:
+    """Get a flat function equivalent to `node.parse_dto`"""
+    return _compile(node, "py_parse_dto")
+
+
+def compile_create_dto(node, positional_objects: bool = False) -> Codec:
+    """Get a flat function equivalent to `node.create_dto`"""
+    return _compile(node, "py_create_dto", CodecContext(positional_objects=positional_objects))
+
+
+def compile_write_json(node) -> Codec:
+    """Get a function writing json text for a python value in a single pass
+
+    Equivalent to encoding the result of `node.create_dto` as compact json,
+    but without building the intermediate dto structure.
+    """
+    return _compile(node, "py_write_json")
@@ -0,0 +1,104 @@
+import datetime
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+import pytest
+
+from tsgen.types import get_type_tree, Primitive, List, Dict, Nullable, Tuple
+from tsgen.types.codec import compile_parse_dto, compile_create_dto, compile_write_json
+from tsgen.types.typetree__test import DummyTypeNode
+
+
+@dataclass
+class Bar:
+    one_field: datetime.datetime
+    count: int
+
+
+@dataclass
+class Foo:
+    bars: list[Bar]
+    bar_map: dict[str, Optional[Bar]]
+    pair: tuple[int, Bar]
+    maybe_name: Optional[str]
+    flags: tuple[bool, float]
+
+
+FOO = Foo(
+    bars=[Bar(datetime.datetime(2021, 4, 25, 10), 1)],
+    bar_map={"a": None, "b": Bar(datetime.datetime(2021, 4, 26), 2)},
+    pair=(3, Bar(datetime.datetime(2021, 4, 27), 3)),
+    maybe_name=None,
+    flags=(True, 0.5),
+)
+
+
+def test_create_dto_same_as_node():
+    tree = get_type_tree(Foo)
+    assert compile_create_dto(tree)(FOO) == tree.create_dto(FOO)
+
+
+def test_parse_dto_same_as_node():
+    tree = get_type_tree(Foo)
+    dto = tree.create_dto(FOO)
+    assert compile_parse_dto(tree)(dto) == tree.parse_dto(dto) == FOO
+
+
+def test_primitive_subtrees_pass_through():
+    create = compile_create_dto(List(Nullable(Primitive(int))))
+    assert "for" not in create.__tsgen_source__
+    assert create([1, None]) == [1, None]
+    assert compile_create_dto(Dict(Primitive(str)))({"a": "b"}) == {"a": "b"}
+
+
+def test_list_parse_rejects_other_iterables():
+    parse = compile_parse_dto(get_type_tree(list[str]))
+    assert parse(["abc"]) == ["abc"]
+    with pytest.raises(AssertionError):
+        parse("abc")
+
+
+def test_object_keys_precomputed():
+    source = compile_create_dto(get_type_tree(Bar)).__tsgen_source__
+    assert "'oneField'" in source
+    assert "to_camel" not in source
+
+
+def test_tuple_parse():
+    parse = compile_parse_dto(Tuple([Primitive(int)]))
+    assert parse([5]) == (5,)
+
+
+def test_node_fallback():
+    class Doubler(DummyTypeNode):
+        def parse_dto(self, struct):
+            return struct * 2
+
+    assert compile_parse_dto(List(Doubler()))([1, 2]) == [2, 4]
+
+
+def test_write_json_same_as_dto():
+    tree = get_type_tree(Foo)
+    assert json.loads(compile_write_json(tree)(FOO)) == tree.create_dto(FOO)
+
+
+def test_write_json_escaping():
+    write = compile_write_json(Dict(Nullable(Primitive(str))))
+    assert write({'"%s"': "ö\n", "b": None}) == '{"\\"%s\\"":"ö\\n","b":null}'
+
+
+def test_write_json_node_fallback():
+    class Doubler(DummyTypeNode):
+        def create_dto(self, pystruct):
+            return [pystruct, pystruct]
+
+    assert compile_write_json(Tuple([Doubler()]))(("a",)) == '[["a","a"]]'
+
+
+def test_write_json_mistyped_primitives():
+    # annotations aren't enforced, so write what the json module would for mistyped values
+    write = compile_write_json(get_type_tree(tuple[int, str, int]))
+    assert write((1.5, 2, True)) == '[1.5,2,true]'
+    write = compile_write_json(get_type_tree(tuple[bool, bool, bool]))
+    assert write((None, 0, True)) == '[null,0,true]'
@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+from operator import attrgetter
+
+from tsgen.code_snippet_context import CodeSnippetContext
+from tsgen.formatting import to_camel
+from tsgen.types.base import AbstractNode, cached_dto_tree
+from tsgen.types.codec import CodecContext
+from tsgen.types.list import List
+from tsgen.types.object import Object
+from tsgen.types.stream import Stream
+
+
+@dataclass()
+class Columnar(AbstractNode):
+    """A list of objects transported as an object of lists ("struct of arrays")
+
+    `[{"a": 1, "b": 2}, {"a": 3, "b": 4}]` is sent as `{"a": [1, 3], "b": [2, 4]}`
+    which avoids repeating the keys for every item. Both the python and typescript
+    side expose the value as a regular list of objects.
+
+    Not matched automatically, use `typed(columnar=True)` or `Columnar.from_list`.
+    """
+    element_node: Object
+    TO_COLUMNS_TS_HELPER = """
+const _toColumns = <T>(rows: T[], keys: (keyof T)[]): { [K in keyof T]: T[K][] } => {
+  const columns: any = {};
+  keys.forEach((key) => {
+    columns[key] = rows.map(row => row[key]);
+  });
+  return columns;
+}
+"""
+    FROM_COLUMNS_TS_HELPER = """
+const _fromColumns = <T>(columns: { [K in keyof T]: T[K][] }): T[] => {
+  const keys = Object.keys(columns) as (keyof T)[];
+  const length = keys.length ? columns[keys[0]].length : 0;
+  const rows: T[] = [];
+  for (let i = 0; i < length; i++) {
+    const row: any = {};
+    keys.forEach((key) => {
+      row[key] = columns[key][i];
+    });
+    rows.push(row);
+  }
+  return rows;
+}
+"""
+
+    @classmethod
+    def from_list(cls, node: AbstractNode) -> "Columnar":
+        # streams are iterated only once, so they can't be split into columns
+        if not (isinstance(node, List) and not isinstance(node, Stream) and isinstance(node.element_node, Object)):
+            raise TypeError(f"Columnar encoding requires a list of dataclasses, got {node}")
+        return Columnar(node.element_node)
+
+    def ts_repr(self, ctx: CodeSnippetContext) -> str:
+        return f"{self.element_node.ts_repr(ctx)}[]"
+
+    @cached_dto_tree
+    def dto_tree(self) -> AbstractNode:
+        def failing_constructor():
+            raise RuntimeError("Dto object type should never be instantiated on the Python side")
+
+        element_dto_tree = self.element_node.dto_tree()
+        return Object(
+            name=f"_{self.element_node.name}Columns",
+            constructor=failing_constructor,
+            fields={name: List(sub_node) for name, sub_node in element_dto_tree.fields.items()},
+            public=False,
+            translate_name=False,
+        )
+
+    def parse_dto(self, struct):
+        names = list(self.element_node.fields)
+        columns = [
+            sub_node.parse_dto_batch(struct[to_camel(name)])
+            for name, sub_node in self.element_node.fields.items()
+        ]
+        constructor = self.element_node.constructor
+        return [constructor(**dict(zip(names, values))) for values in zip(*columns)]
+
+    def create_dto(self, pystruct):
+        return {
+            to_camel(name): sub_node.create_dto_batch(list(map(attrgetter(name), pystruct)))
+            for name, sub_node in self.element_node.fields.items()
+        }
+
+    def py_parse_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        if not self.element_node.fields:
+            return "[]"  # like zipping no columns in `parse_dto`
+
+        def body(struct):
+            names = [ctx.fresh_name(name) for name in self.element_node.fields]
+            columns = [
+                List(sub_node).py_parse_dto(ctx, f"{struct}[{to_camel(name)!r}]")
+                for name, sub_node in self.element_node.fields.items()
+            ]
+            kwargs = ", ".join(f"{name}={var}" for name, var in zip(self.element_node.fields, names))
+            constructor = ctx.bind("new", self.element_node.constructor)
+            return f"[{constructor}({kwargs}) for {''.join(n + ', ' for n in names)} in zip({', '.join(columns)})]"
+
+        func_name = ctx.function("parse_columns", ("parse", id(self)), body)
+        return f"{func_name}({py_expression})"
+
+    def py_create_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        items = []
+        columns = []
+        for name, sub_node in self.element_node.fields.items():
+            item = ctx.fresh_name("item")
+            column = f"[{sub_node.py_create_dto(ctx, f'{item}.{name}')} for {item} in {py_expression}]"
+            columns.append(column)
+            items.append(f"{to_camel(name)!r}: {column}")
+        if ctx.positional_objects:
+            return f"[{', '.join(columns)}]"
+        return f"{{{', '.join(items)}}}"
+
+    def ts_parse_dto(self, ctx: CodeSnippetContext, ts_expression: str) -> str:
+        ctx.add("_fromColumns", self.FROM_COLUMNS_TS_HELPER)
+        element_dto_type = self.element_node.dto_tree().ts_repr(ctx)
+        return List(self.element_node).ts_parse_dto(ctx, f"_fromColumns<{element_dto_type}>({ts_expression})")
+
+    def ts_create_dto(self, ctx: CodeSnippetContext, ts_expression: str) -> str:
+        ctx.add("_toColumns", self.TO_COLUMNS_TS_HELPER)
+        rows = List(self.element_node).ts_create_dto(ctx, ts_expression)
+        keys = ", ".join(f"'{to_camel(name)}'" for name in self.element_node.fields)
+        return f"_toColumns({rows}, [{keys}])"
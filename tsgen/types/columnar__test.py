@@ -0,0 +1,71 @@
+import datetime
+from dataclasses import dataclass
+from typing import Iterator
+
+import pytest
+
+from tsgen.code_snippet_context import CodeSnippetContext
+from tsgen.types import get_type_tree
+from tsgen.types.codec import compile_parse_dto, compile_create_dto, compile_write_json
+from tsgen.types.columnar import Columnar
+
+
+@dataclass
+class Row:
+    row_id: int
+    created: datetime.datetime
+
+
+ROWS = [Row(1, datetime.datetime(2021, 4, 25)), Row(2, datetime.datetime(2021, 4, 26))]
+COLUMNS = {"rowId": [1, 2], "created": ["2021-04-25T00:00:00Z", "2021-04-26T00:00:00Z"]}
+
+
+def test_from_list():
+    assert Columnar.from_list(get_type_tree(list[Row])) == Columnar(get_type_tree(Row))
+    with pytest.raises(TypeError):
+        Columnar.from_list(get_type_tree(list[int]))
+    with pytest.raises(TypeError):
+        Columnar.from_list(get_type_tree(Iterator[Row]))  # would be consumed by the first column
+
+
+def test_dto():
+    t = Columnar(get_type_tree(Row))
+    assert t.create_dto(ROWS) == COLUMNS
+    assert t.parse_dto(COLUMNS) == ROWS
+
+
+def test_compiled_dto():
+    t = Columnar(get_type_tree(Row))
+    assert compile_create_dto(t)(ROWS) == COLUMNS
+    assert compile_parse_dto(t)(COLUMNS) == ROWS
+    assert compile_create_dto(t)([]) == {"rowId": [], "created": []}
+    assert compile_write_json(t)(ROWS) == '{"rowId":[1,2],"created":["2021-04-25T00:00:00Z","2021-04-26T00:00:00Z"]}'
+
+
+@dataclass
+class Empty:
+    pass
+
+
+def test_zero_fields():
+    t = Columnar(get_type_tree(Empty))
+    assert t.create_dto([Empty()]) == {}
+    assert compile_create_dto(t)([Empty()]) == {}
+    assert compile_write_json(t)([Empty()]) == "{}"
+    assert t.parse_dto({}) == []
+    assert compile_parse_dto(t)({}) == []
+
+
+def test_ts():
+    ctx = CodeSnippetContext()
+    t = Columnar(get_type_tree(Row))
+    assert t.ts_repr(ctx) == "Row[]"
+    assert t.dto_tree().ts_repr(ctx) == "_RowColumns"
+    assert ctx.get_snippet("_RowColumns") == """interface _RowColumns {
+  rowId: number[];
+  created: string[];
+}"""
+    assert t.ts_parse_dto(ctx, "dto") == "_fromColumns<_RowDto>(dto).map(item => ({...item, created: new Date(item.created)}))"
+    assert t.ts_create_dto(ctx, "rows") == (
+        "_toColumns(rows.map(item => ({...item, created: _formatISODateTimeString(item.created)})), ['rowId', 'created'])"
+    )
@@ -1,13 +1,59 @@
 import datetime
+import functools
 from dataclasses import dataclass
 from typing import Optional
 
 from tsgen.code_snippet_context import CodeSnippetContext
 from tsgen.types.base import AbstractNode, Primitive
+from tsgen.types.codec import CodecContext
+
+PARSE_CACHE_SIZE = 4096  # timestamps tend to repeat a lot within and across payloads
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_iso_datetime(s: str) -> datetime.datetime:
+    """Parse an ISO 8601 datetime string
+
+    Strings ending in "Z" are parsed as naive (UTC) datetimes while other
+    utc offsets give timezone aware datetimes. Fractional seconds are allowed.
+    """
+    if (
+        len(s) == 20 and s[19] == "Z" and s[10] == "T"
+        and s[4] == s[7] == "-" and s[13] == s[16] == ":"
+    ):
+        # fast path for the canonical dto format "%Y-%m-%dT%H:%M:%SZ"
+        return datetime.datetime(
+            int(s[0:4]), int(s[5:7]), int(s[8:10]),
+            int(s[11:13]), int(s[14:16]), int(s[17:19]),
+        )
+    if s.endswith("Z"):
+        s = s[:-1]
+    return datetime.datetime.fromisoformat(s)
+
+
+def format_iso_datetime(d: datetime.datetime) -> str:
+    """Format a datetime as "%Y-%m-%dT%H:%M:%SZ"
+
+    Naive datetimes are assumed to be UTC, aware ones are converted to UTC
+    """
+    if d.tzinfo is not None:
+        d = d.astimezone(datetime.timezone.utc)
+    return "%04d-%02d-%02dT%02d:%02d:%02dZ" % (d.year, d.month, d.day, d.hour, d.minute, d.second)
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_iso_date(s: str) -> datetime.date:
+    return datetime.date.fromisoformat(s)
+
+
+def format_iso_date(d: datetime.date) -> str:
+    return "%04d-%02d-%02d" % (d.year, d.month, d.day)
 
 
 @dataclass()
 class DateTime(AbstractNode):
+    match_types = (datetime.datetime,)
+
     @classmethod
     def match(cls, pytype: type, localns=None) -> Optional[AbstractNode]:
         if pytype == datetime.datetime:
@@ -18,11 +64,27 @@ class DateTime(AbstractNode):
 
     def parse_dto(self, struct):
         assert isinstance(struct, str)
-        return datetime.datetime.strptime(struct, "%Y-%m-%dT%H:%M:%SZ")
+        return parse_iso_datetime(struct)
 
     def create_dto(self, pystruct):
         assert isinstance(pystruct, datetime.datetime)
-        return pystruct.strftime("%Y-%m-%dT%H:%M:%SZ")
+        return format_iso_datetime(pystruct)
+
+    def parse_dto_batch(self, structs) -> list:
+        return list(map(parse_iso_datetime, structs))
+
+    def create_dto_batch(self, pystructs) -> list:
+        return list(map(format_iso_datetime, pystructs))
+
+    def py_parse_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        return f"{ctx.bind('parse_datetime', parse_iso_datetime)}({py_expression})"
+
+    def py_create_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        return f"{ctx.bind('format_datetime', format_iso_datetime)}({py_expression})"
+
+    def py_write_json(self, ctx: CodecContext, py_expression: str) -> str:
+        # formatted dates never contain characters that need escaping
+        return f"('\"%s\"' % {self.py_create_dto(ctx, py_expression)})"
 
     def ts_parse_dto(self, ctx: CodeSnippetContext, ts_expression: str) -> Optional[str]:
         return f"new Date({ts_expression})"
@@ -40,6 +102,8 @@ class DateTime(AbstractNode):
 
 @dataclass()
 class Date(AbstractNode):
+    match_types = (datetime.date,)
+
     @classmethod
     def match(cls, pytype: type, localns=None) -> Optional[AbstractNode]:
         if pytype == datetime.date:
@@ -50,11 +114,26 @@ class Date(AbstractNode):
 
     def parse_dto(self, struct):
         assert isinstance(struct, str)
-        return datetime.datetime.strptime(struct, "%Y-%m-%d").date()
+        return parse_iso_date(struct)
 
     def create_dto(self, pystruct):
         assert isinstance(pystruct, datetime.date)
-        return pystruct.strftime("%Y-%m-%d")
+        return format_iso_date(pystruct)
+
+    def parse_dto_batch(self, structs) -> list:
+        return list(map(parse_iso_date, structs))
+
+    def create_dto_batch(self, pystructs) -> list:
+        return list(map(format_iso_date, pystructs))
+
+    def py_parse_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        return f"{ctx.bind('parse_date', parse_iso_date)}({py_expression})"
+
+    def py_create_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        return f"{ctx.bind('format_date', format_iso_date)}({py_expression})"
+
+    def py_write_json(self, ctx: CodecContext, py_expression: str) -> str:
+        return f"('\"%s\"' % {self.py_create_dto(ctx, py_expression)})"
 
     def ts_parse_dto(self, ctx: CodeSnippetContext, ts_expression: str) -> Optional[str]:
         return f"new Date({ts_expression} + 'Z')"
@@ -0,0 +1,42 @@
+import datetime
+
+import pytest
+
+from tsgen.types import DateTime, Date, List
+from tsgen.types.codec import compile_parse_dto, compile_create_dto
+from tsgen.types.dates import parse_iso_datetime
+
+
+def test_parse_fractional_seconds():
+    assert DateTime().parse_dto("2021-04-25T10:11:12.500Z") == datetime.datetime(2021, 4, 25, 10, 11, 12, 500000)
+
+
+def test_parse_timezone_aware():
+    parsed = DateTime().parse_dto("2021-04-25T12:11:12+02:00")
+    assert parsed.utcoffset() == datetime.timedelta(hours=2)
+    assert DateTime().create_dto(parsed) == "2021-04-25T10:11:12Z"
+
+
+def test_parse_malformed():
+    with pytest.raises(ValueError):
+        parse_iso_datetime("2021/04/25T10.11.12Z")
+
+
+def test_parse_is_cached():
+    assert parse_iso_datetime("2021-04-25T10:11:12Z") is parse_iso_datetime("2021-04-25T10:11:12Z")
+
+
+def test_list_batch():
+    dtos = ["2021-04-25T10:11:12Z", "2021-04-26T00:00:00Z"]
+    parsed = [datetime.datetime(2021, 4, 25, 10, 11, 12), datetime.datetime(2021, 4, 26)]
+    t = List(DateTime())
+    assert t.parse_dto(dtos) == parsed
+    assert t.create_dto(parsed) == dtos
+    assert "map(" in compile_parse_dto(t).__tsgen_source__
+    assert compile_parse_dto(t)(dtos) == parsed
+    assert compile_create_dto(t)(parsed) == dtos
+
+
+def test_date_roundtrip():
+    assert Date().create_dto(datetime.date(21, 4, 5)) == "0021-04-05"
+    assert Date().parse_dto("0021-04-05") == datetime.date(21, 4, 5)
@@ -3,7 +3,8 @@ from types import GenericAlias
 from typing import Optional
 
 from tsgen.code_snippet_context import CodeSnippetContext
-from tsgen.types.base import AbstractNode, UnsupportedTypeError, UnsupportedTypeNode
+from tsgen.types.base import AbstractNode, UnsupportedTypeError, UnsupportedTypeNode, cached_dto_tree
+from tsgen.types.codec import CodecContext, json_str
 from tsgen.types.typetree import get_type_tree
 
 
@@ -20,6 +21,8 @@ const _mapObject = <T, U>(o: { [key: string]: T }, f: (t: T) => U) : { [key: str
 }
 """
 
+    match_origins = (dict,)
+
     @classmethod
     def match(cls, pytype: type, localns=None) -> Optional[AbstractNode]:
         if isinstance(pytype, GenericAlias) and pytype.__origin__ == dict:
@@ -54,5 +57,26 @@ const _mapObject = <T, U>(o: { [key: string]: T }, f: (t: T) => U) : { [key: str
             return ts_expression
         return f"_mapObject({ts_expression}, val => ({sub_expr}))"
 
+    @cached_dto_tree
     def dto_tree(self) -> AbstractNode:
-        return Dict(value_type=self.value_type.dto_tree())
\ No newline at end of file
+        return Dict(value_type=self.value_type.dto_tree())
+
+    def py_parse_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        return self._py_recode_helper(ctx, py_expression, self.value_type.py_parse_dto)
+
+    def py_create_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        return self._py_recode_helper(ctx, py_expression, self.value_type.py_create_dto)
+
+    def py_write_json(self, ctx: CodecContext, py_expression: str) -> str:
+        key, val = ctx.fresh_name("key"), ctx.fresh_name("val")
+        sub_expr = self.value_type.py_write_json(ctx, val)
+        items = f"['%s:%s' % ({ctx.bind('json_str', json_str)}({key}), {sub_expr}) for {key}, {val} in {py_expression}.items()]"
+        return f"('{{%s}}' % ','.join({items}))"
+
+    @staticmethod
+    def _py_recode_helper(ctx: CodecContext, py_expression: str, sub_func) -> str:
+        key, val = ctx.fresh_name("key"), ctx.fresh_name("val")
+        sub_expr = sub_func(ctx, val)
+        if sub_expr == val:
+            return f"dict({py_expression})"
+        return f"{{{key}: {sub_expr} for {key}, {val} in {py_expression}.items()}}"
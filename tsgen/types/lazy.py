@@ -0,0 +1,70 @@
+"""Decode-on-access views over dto structures
+
+For large payloads where only a few fields are used, parsing the whole
+structure up front is wasted work. A lazy parser instead wraps objects in
+`LazyObject` views, which parse (and cache) each field on first access.
+Nested objects, including objects in lists, are wrapped lazily as well.
+"""
+from typing import Any
+
+from tsgen.formatting import to_camel
+from tsgen.types.base import AbstractNode
+from tsgen.types.codec import Codec, compile_parse_dto
+from tsgen.types.list import List
+from tsgen.types.nullable import Nullable
+from tsgen.types.object import Object
+
+
+class LazyObject:
+    """Read-only view of an object dto, parsing fields on first attribute access
+
+    Use `materialize()` to get a fully parsed instance of the actual python type.
+    """
+    _fields: dict[str, tuple[str, Codec]]  # python field name -> (dto key, field parser)
+    _parse_dto: Codec
+
+    def __init__(self, dto: dict[str, Any]):
+        self._dto = dto
+
+    def __getattr__(self, name):
+        try:
+            key, parse = self._fields[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        value = parse(self._dto[key])
+        self.__dict__[name] = value  # subsequent lookups never reach __getattr__
+        return value
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._dto!r})"
+
+    def materialize(self):
+        return self._parse_dto(self._dto)
+
+
+def compile_lazy_parse_dto(node: AbstractNode) -> Codec:
+    """Get a parser creating lazy views for the object types of a tree
+
+    Node types without lazy support are parsed eagerly.
+    """
+    if isinstance(node, Object):
+        return type(f"Lazy{node.name or 'Object'}", (LazyObject,), {
+            "_fields": {
+                name: (to_camel(name), compile_lazy_parse_dto(sub_node))
+                for name, sub_node in node.fields.items()
+            },
+            "_parse_dto": staticmethod(compile_parse_dto(node)),
+        })
+    if isinstance(node, Nullable):
+        parse_sub = compile_lazy_parse_dto(node.subtype)
+        return lambda struct: None if struct is None else parse_sub(struct)
+    if isinstance(node, List) and _has_objects(node.element_node):
+        parse_element = compile_lazy_parse_dto(node.element_node)
+        return lambda struct: list(map(parse_element, struct))
+    return compile_parse_dto(node)
+
+
+def _has_objects(node: AbstractNode) -> bool:
+    while isinstance(node, (List, Nullable)):
+        node = node.element_node if isinstance(node, List) else node.subtype
+    return isinstance(node, Object)
@@ -0,0 +1,49 @@
+import datetime
+from dataclasses import dataclass
+from typing import Optional
+
+from tsgen.types import get_type_tree
+from tsgen.types.lazy import compile_lazy_parse_dto, LazyObject
+
+
+@dataclass
+class Item:
+    created: datetime.datetime
+
+
+@dataclass
+class Batch:
+    batch_name: str
+    items: list[Item]
+    parent: Optional[Item]
+
+
+DTO = {
+    "batchName": "first",
+    "items": [{"created": "2021-04-25T00:00:00Z"}, {"created": "not a date"}],
+    "parent": None,
+}
+
+
+def test_fields_parsed_on_access():
+    batch = compile_lazy_parse_dto(get_type_tree(Batch))(DTO)
+    assert isinstance(batch, LazyObject)
+    assert batch.batch_name == "first"
+    assert batch.parent is None
+    assert batch.items[0].created == datetime.datetime(2021, 4, 25)
+    assert "created" not in vars(batch.items[1])  # invalid value never parsed
+
+
+def test_access_is_cached():
+    batch = compile_lazy_parse_dto(get_type_tree(Batch))(DTO)
+    assert batch.items is batch.items
+
+
+def test_materialize():
+    dto = dict(DTO, items=[{"created": "2021-04-25T00:00:00Z"}])
+    batch = compile_lazy_parse_dto(get_type_tree(Batch))(dto)
+    assert batch.materialize() == Batch("first", [Item(datetime.datetime(2021, 4, 25))], None)
+
+
+def test_non_object_is_eager():
+    assert compile_lazy_parse_dto(get_type_tree(list[int]))([1, 2]) == [1, 2]
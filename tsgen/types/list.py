@@ -1,8 +1,10 @@
+import re
 from dataclasses import dataclass
 from types import GenericAlias
 
 from tsgen.code_snippet_context import CodeSnippetContext
-from tsgen.types.base import AbstractNode
+from tsgen.types.base import AbstractNode, cached_dto_tree
+from tsgen.types.codec import CodecContext
 from tsgen.types.typetree import get_type_tree
 
 
@@ -10,6 +12,8 @@ from tsgen.types.typetree import get_type_tree
 class List(AbstractNode):
     element_node: AbstractNode
 
+    match_origins = (list,)
+
     @classmethod
     def match(cls, pytype: type, localns=None):
         if isinstance(pytype, GenericAlias) and pytype.__origin__ == list:
@@ -20,11 +24,10 @@ class List(AbstractNode):
         return f"{self.element_node.ts_repr(ctx)}[]"
 
     def parse_dto(self, struct):
-        assert isinstance(struct, list)
-        return [self.element_node.parse_dto(it) for it in struct]
+        return self.element_node.parse_dto_batch(_checked_list(struct))
 
     def create_dto(self, pystruct):
-        return [self.element_node.create_dto(it) for it in pystruct]
+        return self.element_node.create_dto_batch(pystruct)
 
     def ts_create_dto(self, ctx: CodeSnippetContext, ts_expression: str) -> str:
         sub_expression = self.element_node.ts_create_dto(ctx, "item")
@@ -38,5 +41,39 @@ class List(AbstractNode):
             return ts_expression
         return f"{ts_expression}.map(item => ({sub_expression}))"
 
+    @cached_dto_tree
     def dto_tree(self) -> AbstractNode:
         return List(self.element_node.dto_tree())
+
+    def py_parse_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        item = ctx.fresh_name("item")
+        checked = f"{ctx.bind('checked_list', _checked_list)}({py_expression})"
+        return self._py_map_expression(item, self.element_node.py_parse_dto(ctx, item), checked)
+
+    def py_create_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        item = ctx.fresh_name("item")
+        return self._py_map_expression(item, self.element_node.py_create_dto(ctx, item), py_expression)
+
+    def py_write_json(self, ctx: CodecContext, py_expression: str) -> str:
+        item = ctx.fresh_name("item")
+        sub_expression = self.element_node.py_write_json(ctx, item)
+        if call := re.fullmatch(rf"(\w+)\({item}\)", sub_expression):
+            items = f"map({call.group(1)}, {py_expression})"
+        else:
+            items = f"[{sub_expression} for {item} in {py_expression}]"
+        return f"('[%s]' % ','.join({items}))"
+
+    @staticmethod
+    def _py_map_expression(item: str, sub_expression: str, py_expression: str) -> str:
+        if sub_expression == item:
+            return f"list({py_expression})"
+        if call := re.fullmatch(rf"(\w+)\({item}\)", sub_expression):
+            # plain function calls per element are converted in a single batch
+            return f"list(map({call.group(1)}, {py_expression}))"
+        return f"[{sub_expression} for {item} in {py_expression}]"
+
+
+def _checked_list(struct):
+    # other iterables, e.g. strings, would otherwise be parsed item by item
+    assert isinstance(struct, list)
+    return struct
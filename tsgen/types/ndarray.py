@@ -0,0 +1,89 @@
+import sys
+from dataclasses import dataclass
+from typing import Optional
+
+from tsgen.code_snippet_context import CodeSnippetContext
+from tsgen.types.base import AbstractNode, Primitive, cached_dto_tree
+from tsgen.types.codec import CodecContext
+from tsgen.types.list import List
+
+# numpy scalar type name -> typescript typed array
+TS_TYPED_ARRAYS: dict[str, str] = {
+    "float64": "Float64Array",
+    "float32": "Float32Array",
+    "int32": "Int32Array",
+    "int16": "Int16Array",
+    "int8": "Int8Array",
+    "uint32": "Uint32Array",
+    "uint16": "Uint16Array",
+    "uint8": "Uint8Array",
+}
+
+
+@dataclass()
+class NDArray(AbstractNode):
+    """One dimensional numpy arrays of numbers
+
+    Matches `numpy.ndarray` and `numpy.typing.NDArray[<scalar type>]` annotations.
+    Arrays are transported as json lists of numbers and converted as a whole
+    instead of item by item. Arrays with a known dtype that has a typescript
+    typed array equivalent (e.g. `Float64Array`) are exposed as such in the
+    generated client code, and as `number[]` otherwise.
+
+    numpy is an optional dependency and is never imported by tsgen itself -
+    if it hasn't been imported by the application, no annotations can refer to it.
+    """
+    dtype: Optional[type] = None  # numpy scalar type, e.g. numpy.float64
+
+    @classmethod
+    def match(cls, pytype: type, localns=None) -> Optional[AbstractNode]:
+        numpy = sys.modules.get("numpy")
+        if numpy is None:
+            return None
+        if pytype is numpy.ndarray:
+            return NDArray()
+        if getattr(pytype, "__origin__", None) is numpy.ndarray:
+            dtype_args = getattr(pytype.__args__[1], "__args__", ())
+            if dtype_args and isinstance(dtype_args[0], type) and issubclass(dtype_args[0], numpy.number):
+                return NDArray(dtype=dtype_args[0])
+            return NDArray()
+
+    def _ts_typed_array(self) -> Optional[str]:
+        if self.dtype is None:
+            return None
+        return TS_TYPED_ARRAYS.get(self.dtype.__name__)
+
+    def ts_repr(self, ctx: CodeSnippetContext) -> str:
+        return self._ts_typed_array() or "number[]"
+
+    def parse_dto(self, struct):
+        import numpy
+        return _check_one_dimensional(numpy.asarray(struct, dtype=self.dtype))
+
+    def create_dto(self, pystruct):
+        return _check_one_dimensional(pystruct).tolist()
+
+    def py_create_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        return f"{ctx.bind('check', _check_one_dimensional)}({py_expression}).tolist()"
+
+    def ts_parse_dto(self, ctx: CodeSnippetContext, ts_expression: str) -> str:
+        typed_array = self._ts_typed_array()
+        if typed_array is None:
+            return ts_expression
+        return f"{typed_array}.from({ts_expression})"
+
+    def ts_create_dto(self, ctx: CodeSnippetContext, ts_expression: str) -> str:
+        if self._ts_typed_array() is None:
+            return ts_expression
+        return f"Array.from({ts_expression})"
+
+    @cached_dto_tree
+    def dto_tree(self) -> AbstractNode:
+        return List(Primitive(float))
+
+
+def _check_one_dimensional(array):
+    # the typescript side is a flat (typed) array, nested lists would silently mistype it
+    if array.ndim != 1:
+        raise ValueError(f"Only one dimensional arrays are supported, got shape {array.shape}")
+    return array
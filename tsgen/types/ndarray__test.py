@@ -0,0 +1,45 @@
+import pytest
+
+from tsgen.code_snippet_context import CodeSnippetContext
+from tsgen.types import get_type_tree, NDArray
+from tsgen.types.codec import compile_create_dto, compile_write_json
+
+numpy = pytest.importorskip("numpy")
+numpy_typing = pytest.importorskip("numpy.typing")
+
+
+def test_match():
+    assert get_type_tree(numpy.ndarray) == NDArray()
+    assert get_type_tree(numpy_typing.NDArray[numpy.float32]) == NDArray(dtype=numpy.float32)
+
+
+def test_dto():
+    t = NDArray(dtype=numpy.int32)
+    arr = t.parse_dto([1, 2, 3])
+    assert arr.dtype == numpy.int32
+    assert t.create_dto(arr) == [1, 2, 3]
+    assert compile_create_dto(t)(arr) == [1, 2, 3]
+    assert compile_write_json(t)(arr) == "[1,2,3]"
+
+
+def test_multi_dimensional_rejected():
+    t = NDArray()
+    matrix = numpy.zeros((2, 2))
+    with pytest.raises(ValueError):
+        t.create_dto(matrix)
+    with pytest.raises(ValueError):
+        compile_create_dto(t)(matrix)
+    with pytest.raises(ValueError):
+        compile_write_json(t)(matrix)
+    with pytest.raises(ValueError):
+        t.parse_dto([[1, 2], [3, 4]])
+
+
+def test_ts():
+    ctx = CodeSnippetContext()
+    assert NDArray(dtype=numpy.float64).ts_repr(ctx) == "Float64Array"
+    assert NDArray(dtype=numpy.float64).ts_parse_dto(ctx, "dto") == "Float64Array.from(dto)"
+    assert NDArray(dtype=numpy.float64).ts_create_dto(ctx, "arr") == "Array.from(arr)"
+    assert NDArray().ts_repr(ctx) == "number[]"
+    assert NDArray().ts_parse_dto(ctx, "dto") == "dto"
+    assert NDArray().dto_tree().ts_repr(ctx) == "number[]"
@@ -3,6 +3,7 @@ from dataclasses import dataclass
 
 from tsgen.code_snippet_context import CodeSnippetContext
 from tsgen.types.base import AbstractNode
+from tsgen.types.codec import CodecContext
 from tsgen.types.typetree import get_type_tree
 
 
@@ -10,6 +11,8 @@ from tsgen.types.typetree import get_type_tree
 class Nullable(AbstractNode):
     subtype: AbstractNode
 
+    match_origins = (typing.Union,)
+
     # noinspection PyUnresolvedReferences
     @classmethod
     def match(cls, pytype: type, localns=None) -> typing.Optional[AbstractNode]:
@@ -43,3 +46,18 @@ class Nullable(AbstractNode):
 
     def dto_tree(self) -> AbstractNode:
         return self.subtype.dto_tree()
+
+    def py_parse_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        sub_expr = self.subtype.py_parse_dto(ctx, py_expression)
+        if sub_expr == py_expression:
+            return py_expression
+        return f"(None if {py_expression} is None else {sub_expr})"
+
+    def py_create_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        sub_expr = self.subtype.py_create_dto(ctx, py_expression)
+        if sub_expr == py_expression:
+            return py_expression
+        return f"(None if {py_expression} is None else {sub_expr})"
+
+    def py_write_json(self, ctx: CodecContext, py_expression: str) -> str:
+        return f"('null' if {py_expression} is None else {self.subtype.py_write_json(ctx, py_expression)})"
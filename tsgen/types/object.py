@@ -1,13 +1,14 @@
 import dataclasses
+import json
 from dataclasses import dataclass, is_dataclass
 from typing import get_type_hints, Callable, Optional
 
-import jinja2
-
 from tsgen.code_snippet_context import CodeSnippetContext
 from tsgen.formatting import to_pascal, to_camel
-from tsgen.types.base import AbstractNode
+from tsgen.types.base import AbstractNode, cached_dto_tree
+from tsgen.types.codec import CodecContext
 from tsgen.types.typetree import get_type_tree
+from tsgen.templates import render
 
 TS_INTERFACE_TEMPLATE = """
 {%- if name %}{{ prefix }}interface {{name}} {% endif %}{
@@ -36,6 +37,8 @@ class Object(AbstractNode):
     public: bool = True
     translate_name: bool = True
 
+    match_dataclasses = True
+
     @classmethod
     def match(cls, pytype: type, localns=None):
         if is_dataclass(pytype):
@@ -65,8 +68,8 @@ class Object(AbstractNode):
             field_ts_name = to_camel(field_name)
             ts_fields.append((field_ts_name, field_ts_type))
 
-        declaration_template = jinja2.Template(TS_INTERFACE_TEMPLATE)
-        return declaration_template.render(
+        return render(
+            "interface.ts",
             name=interface_name,
             fields=ts_fields,
             prefix="export " if self.public else ""
@@ -84,6 +87,45 @@ class Object(AbstractNode):
             for name, subtype in self.fields.items()
         }
 
+    def py_parse_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        def body(struct):
+            kwargs = ", ".join(
+                f"{name}={subtype.py_parse_dto(ctx, f'{struct}[{to_camel(name)!r}]')}"
+                for name, subtype in self.fields.items()
+            )
+            return f"{ctx.bind('new', self.constructor)}({kwargs})"
+
+        func_name = ctx.function(f"parse_{self.name or 'object'}_", ("parse", id(self)), body)
+        return f"{func_name}({py_expression})"
+
+    def py_create_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        def body(pystruct):
+            if ctx.positional_objects:
+                values = ", ".join(
+                    subtype.py_create_dto(ctx, f"{pystruct}.{name}")
+                    for name, subtype in self.fields.items()
+                )
+                return f"[{values}]"
+            items = ", ".join(
+                f"{to_camel(name)!r}: {subtype.py_create_dto(ctx, f'{pystruct}.{name}')}"
+                for name, subtype in self.fields.items()
+            )
+            return f"{{{items}}}"
+
+        func_name = ctx.function(f"create_{self.name or 'object'}_", ("create", id(self)), body)
+        return f"{func_name}({py_expression})"
+
+    def py_write_json(self, ctx: CodecContext, py_expression: str) -> str:
+        def body(pystruct):
+            # escaped json keys are baked into a %-format template
+            keys = [json.dumps(to_camel(name)).replace("%", "%%") for name in self.fields]
+            template = "{" + ",".join(f"{key}:%s" for key in keys) + "}"
+            subs = [subtype.py_write_json(ctx, f"{pystruct}.{name}") for name, subtype in self.fields.items()]
+            return f"({template!r} % ({''.join(sub + ', ' for sub in subs)}))"
+
+        func_name = ctx.function(f"write_{self.name or 'object'}_", ("write", id(self)), body)
+        return f"{func_name}({py_expression})"
+
     def _dto_recode_helper(self, ctx: CodeSnippetContext, ts_expression: str, func_getter):
         subexprs = []
         for name, subtype in self.fields.items():
@@ -105,6 +147,7 @@ class Object(AbstractNode):
     def ts_parse_dto(self, ctx: CodeSnippetContext, ts_expression: str) -> str:
         return self._dto_recode_helper(ctx, ts_expression, lambda t: t.ts_parse_dto)
 
+    @cached_dto_tree
     def dto_tree(self) -> AbstractNode:
         sub_trees = {
             name: field_tree.dto_tree()
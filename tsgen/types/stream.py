@@ -0,0 +1,30 @@
+import collections.abc
+from dataclasses import dataclass
+
+from tsgen.types.base import AbstractNode, cached_dto_tree
+from tsgen.types.list import List
+from tsgen.types.typetree import get_type_tree
+
+STREAM_ORIGINS = (collections.abc.Iterator, collections.abc.Iterable, collections.abc.Generator)
+
+
+@dataclass()
+class Stream(List):
+    """Iterators and iterables of items
+
+    When used as the return type of a typed view, the items are streamed
+    one by one as newline delimited json (see `tsgen.flask_integration.typed`)
+    and consumed incrementally by the generated client function.
+    Anywhere else they are transported like a plain list.
+    """
+    match_origins = STREAM_ORIGINS
+
+    @classmethod
+    def match(cls, pytype: type, localns=None):
+        if getattr(pytype, "__origin__", None) in STREAM_ORIGINS:
+            subtype = pytype.__args__[0]
+            return Stream(element_node=get_type_tree(subtype, localns=localns))
+
+    @cached_dto_tree
+    def dto_tree(self) -> AbstractNode:
+        return List(self.element_node.dto_tree())
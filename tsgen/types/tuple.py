@@ -3,7 +3,8 @@ from types import GenericAlias
 from typing import Optional
 
 from tsgen.code_snippet_context import CodeSnippetContext
-from tsgen.types.base import AbstractNode
+from tsgen.types.base import AbstractNode, cached_dto_tree
+from tsgen.types.codec import CodecContext
 from tsgen.types.typetree import get_type_tree
 
 
@@ -11,6 +12,8 @@ from tsgen.types.typetree import get_type_tree
 class Tuple(AbstractNode):
     fields: list[AbstractNode]
 
+    match_origins = (tuple,)
+
     @classmethod
     def match(cls, pytype: type, localns=None) -> Optional[AbstractNode]:
         if isinstance(pytype, GenericAlias) and pytype.__origin__ == tuple:
@@ -26,6 +29,7 @@ class Tuple(AbstractNode):
     def create_dto(self, pystruct):
         return [field_tree.create_dto(item) for field_tree, item in zip(self.fields, pystruct)]
 
+    @cached_dto_tree
     def dto_tree(self) -> AbstractNode:
         return Tuple([subtree.dto_tree() for subtree in self.fields])
 
@@ -36,3 +40,16 @@ class Tuple(AbstractNode):
     def ts_parse_dto(self, ctx: CodeSnippetContext, ts_expression: str) -> str:
         subs = [subtree.ts_parse_dto(ctx, f"{ts_expression}[{i}]") for i, subtree in enumerate(self.fields)]
         return f"[{', '.join(subs)}]"
+
+    def py_parse_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        subs = [subtree.py_parse_dto(ctx, f"{py_expression}[{i}]") for i, subtree in enumerate(self.fields)]
+        return f"({''.join(sub + ', ' for sub in subs)})"
+
+    def py_create_dto(self, ctx: CodecContext, py_expression: str) -> str:
+        subs = [subtree.py_create_dto(ctx, f"{py_expression}[{i}]") for i, subtree in enumerate(self.fields)]
+        return f"[{', '.join(subs)}]"
+
+    def py_write_json(self, ctx: CodecContext, py_expression: str) -> str:
+        subs = [subtree.py_write_json(ctx, f"{py_expression}[{i}]") for i, subtree in enumerate(self.fields)]
+        template = f"[{','.join('%s' for _ in subs)}]"
+        return f"({template!r} % ({''.join(sub + ', ' for sub in subs)}))"
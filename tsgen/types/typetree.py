@@ -1,13 +1,159 @@
 from __future__ import annotations
 
-from tsgen.types.base import UnsupportedTypeNode
+from dataclasses import is_dataclass
+from typing import Type
 
-type_registry = []
+from tsgen.types.base import AbstractNode, UnsupportedTypeNode
+
+
+class TypeRegistry:
+    """Node classes used to build type trees, with an index of which python types they match
+
+    Node classes are tried in order of descending priority, and otherwise in the order
+    they were registered. Instead of probing every node class, only the ones keyed
+    (see `AbstractNode.match_types` etc.) on the exact type, the `__origin__` or the
+    dataclass-ness of a python type are tried, along with all node classes without any
+    keys, which can match anything.
+    """
+    def __init__(self):
+        self._entries: list[tuple[int, int, Type[AbstractNode]]] = []  # (-priority, registration index, class)
+        self._registrations = 0
+        self._by_type: dict = {}
+        self._by_origin: dict = {}
+        self._dataclass_classes: list = []
+        self._fallback_classes: list = []
+        self._candidates_cache: dict = {}
+
+    def register(self, node_class: Type[AbstractNode], priority: int = 0) -> Type[AbstractNode]:
+        """Add a node class, can also be used as a class decorator"""
+        if node_class in self:
+            self.unregister(node_class)
+        self._entries.append((-priority, self._registrations, node_class))
+        self._registrations += 1
+        self._entries.sort(key=lambda entry: entry[:2])
+        self._reindex()
+        return node_class
+
+    def unregister(self, node_class: Type[AbstractNode]):
+        self._entries = [entry for entry in self._entries if entry[2] is not node_class]
+        self._reindex()
+
+    def extend(self, node_classes):
+        for node_class in node_classes:
+            self.register(node_class)
+
+    def append(self, node_class: Type[AbstractNode]):
+        self.register(node_class)
+
+    def __iter__(self):
+        return (node_class for _, _, node_class in self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, node_class):
+        return any(node_class is registered for registered in self)
+
+    def _reindex(self):
+        self._by_type.clear()
+        self._by_origin.clear()
+        self._dataclass_classes.clear()
+        self._fallback_classes.clear()
+        self._candidates_cache.clear()
+        for node_class in self:
+            match_types, match_origins, match_dataclasses = _dispatch_keys(node_class)
+            for pytype in match_types:
+                self._by_type.setdefault(pytype, []).append(node_class)
+            for origin in match_origins:
+                self._by_origin.setdefault(origin, []).append(node_class)
+            if match_dataclasses:
+                self._dataclass_classes.append(node_class)
+            if not (match_types or match_origins or match_dataclasses):
+                self._fallback_classes.append(node_class)
+        clear_type_tree_cache()
+
+    def candidates(self, pytype) -> list[Type[AbstractNode]]:
+        """The node classes that could match `pytype`, in the order they should be tried"""
+        try:
+            exact = pytype if pytype in self._by_type else None
+        except TypeError:  # unhashable type annotations
+            exact = None
+        origin = getattr(pytype, "__origin__", None)
+        try:
+            by_origin = self._by_origin.get(origin) if origin is not None else None
+        except TypeError:
+            origin = by_origin = None
+        key = (exact, origin, is_dataclass(pytype))
+        cached = self._candidates_cache.get(key)
+        if cached is not None:
+            return cached
+
+        matching = set(self._fallback_classes)
+        matching.update(self._by_type.get(exact, ()) if exact is not None else ())
+        matching.update(by_origin or ())
+        if key[2]:
+            matching.update(self._dataclass_classes)
+        result = [node_class for node_class in self if node_class in matching]
+        self._candidates_cache[key] = result
+        return result
+
+
+def _dispatch_keys(node_class: Type[AbstractNode]) -> tuple[tuple, tuple, bool]:
+    """The keys a node class is indexed by: `match_types`, `match_origins` and `match_dataclasses`
+
+    Keys only describe the `match()` of the class declaring them, so they are taken from the
+    class defining the `match()` in use. A subclass overriding `match()` without declaring
+    its own keys is tried for every type.
+    """
+    matcher_class = next(cls for cls in node_class.__mro__ if "match" in vars(cls))
+    own = vars(matcher_class)
+    return own.get("match_types", ()), own.get("match_origins", ()), own.get("match_dataclasses", False)
+
+
+type_registry = TypeRegistry()
+
+
+def register_node_type(node_class: Type[AbstractNode] = None, *, priority: int = 0):
+    """Register a custom node class for building type trees
+
+    Can be used as `register_node_type(MyNode)` or as a decorator, with or without
+    arguments. Node classes with higher priority are tried first, and among the
+    built in node classes (priority 0) the new class is tried last.
+    """
+    if node_class is None:
+        return lambda cls: type_registry.register(cls, priority)
+    return type_registry.register(node_class, priority)
+
+
+_type_tree_cache: dict = {}  # pytype -> node, for types resolved without a localns
 
 
 def get_type_tree(pytype: type, localns=None):
-    for node_class in type_registry:
+    """Get the type tree node for a python type
+
+    Results for types resolved without `localns` are cached, so all uses of a type
+    share the same node (and its subtrees). Nodes must therefore not be modified.
+    Trees resolved with a `localns` (typically the locals of some function) aren't
+    cached, since they would keep those locals alive and are rarely looked up again.
+    """
+    if localns is not None:
+        return _resolve_type_tree(pytype, localns)
+    try:
+        cached = _type_tree_cache.get(pytype)
+    except TypeError:  # unhashable type annotations, e.g. with unhashable Annotated metadata
+        return _resolve_type_tree(pytype, localns)
+    if cached is None:
+        cached = _type_tree_cache[pytype] = _resolve_type_tree(pytype, localns)
+    return cached
+
+
+def _resolve_type_tree(pytype: type, localns=None):
+    for node_class in type_registry.candidates(pytype):
         if node := node_class.match(pytype, localns):
             return node
     return UnsupportedTypeNode(pytype)
 
+
+def clear_type_tree_cache():
+    """Forget all resolved type trees, e.g. after changing the type registry"""
+    _type_tree_cache.clear()
@@ -1,15 +1,17 @@
 import datetime
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Iterator, Iterable
 
 import pytest
 
 from tsgen.code_snippet_context import CodeSnippetContext
-from tsgen.types.typetree import get_type_tree
+from tsgen.types.typetree import get_type_tree, _type_tree_cache, type_registry, register_node_type, TypeRegistry
 from tsgen.types.dict import Dict
 from tsgen.types.dates import DateTime, Date
 from tsgen.types.object import Object
 from tsgen.types.list import List
+from tsgen.types.stream import Stream
+from tsgen.types.nullable import Nullable
 from tsgen.types.base import AbstractNode, Primitive, UnsupportedTypeError, UnsupportedTypeNode
 
 
@@ -190,6 +192,10 @@ class TestList:
         assert get_type_tree(list[str]) == List(Primitive(str))
         assert get_type_tree(list[list[bool]]) == List(List(Primitive(bool)))
 
+    def test_stream_tree_parsing(self):
+        assert get_type_tree(Iterator[str]) == Stream(Primitive(str))
+        assert get_type_tree(Iterable[int]).dto_tree() == List(Primitive(int))
+
     def test_list_dto(self):
         t = List.match(list[str])
         assert t.create_dto(["hello", "world"]) == ["hello", "world"]
@@ -248,3 +254,114 @@ class TestDict:
         ctx = CodeSnippetContext()
         parse_expr = Dict(Primitive(str)).ts_create_dto(ctx, "*dtoVar*")
         assert parse_expr == "*dtoVar*"
+
+
+class TestTypeTreeCache:
+    def test_shared_nodes(self):
+        @dataclass
+        class Shared:
+            when: datetime.datetime
+
+        @dataclass
+        class User:
+            shared: Shared
+
+        user_tree = get_type_tree(User)
+        assert get_type_tree(User) is user_tree
+        assert get_type_tree(list[User]).element_node is user_tree
+        assert get_type_tree(Shared) is user_tree.fields["shared"]
+
+    def test_localns_not_cached(self):
+        localns = {}
+        tree = get_type_tree(list[int], localns=localns)
+        assert get_type_tree(list[int], localns=localns) is not tree  # don't keep localns alive
+        assert get_type_tree(list[int], localns=localns) == tree
+        assert not any(cached is tree for cached in _type_tree_cache.values())
+
+    def test_cached_dto_tree(self):
+        @dataclass
+        class WithDate:
+            when: datetime.datetime
+
+        tree = get_type_tree(list[WithDate])
+        assert tree.dto_tree() is tree.dto_tree()
+        assert tree.dto_tree().element_node is tree.element_node.dto_tree()
+
+
+class Money:
+    pass
+
+
+# noinspection PyAbstractClass
+@dataclass()
+class MoneyNode(AbstractNode):
+    match_types = (Money,)
+
+    @classmethod
+    def match(cls, pytype: type, localns=None):
+        if pytype is Money:
+            return MoneyNode()
+
+
+# noinspection PyAbstractClass
+@dataclass()
+class AnythingNode(AbstractNode):
+    @classmethod
+    def match(cls, pytype: type, localns=None):
+        return AnythingNode()
+
+
+class TestTypeRegistry:
+    def test_indexed_candidates(self):
+        assert type_registry.candidates(int)[:1] == [Primitive]
+        assert List in type_registry.candidates(list[int])
+        assert Object not in type_registry.candidates(list[int])
+        assert DateTime in type_registry.candidates(datetime.datetime)
+        assert Date not in type_registry.candidates(datetime.datetime)
+        assert Nullable in type_registry.candidates(Optional[int])
+
+        @dataclass
+        class Foo:
+            pass
+        assert Object in type_registry.candidates(Foo)
+
+    def test_register_custom_node(self):
+        assert isinstance(get_type_tree(Money), UnsupportedTypeNode)
+        register_node_type(MoneyNode)
+        try:
+            assert get_type_tree(Money) == MoneyNode()
+            assert get_type_tree(list[Money]).element_node == MoneyNode()
+        finally:
+            type_registry.unregister(MoneyNode)
+        assert isinstance(get_type_tree(Money), UnsupportedTypeNode)
+
+    def test_priority(self):
+        registry = TypeRegistry()
+        registry.extend([Primitive, List])
+        registry.register(AnythingNode)
+        assert registry.candidates(int) == [Primitive, AnythingNode]
+        assert registry.candidates(Money) == [AnythingNode]
+        registry.register(AnythingNode, priority=1)
+        assert registry.candidates(int) == [AnythingNode, Primitive]
+        assert list(registry) == [AnythingNode, Primitive, List]
+
+    def test_subclass_overriding_match(self):
+        # noinspection PyAbstractClass
+        @dataclass()
+        class MoneyList(List):
+            @classmethod
+            def match(cls, pytype: type, localns=None):
+                if pytype is Money:
+                    return MoneyList(MoneyNode())
+                return super().match(pytype, localns)
+
+        registry = TypeRegistry()
+        registry.extend([Primitive, MoneyList])
+        assert registry.candidates(Money) == [MoneyList]  # not only indexed under List's keys
+        assert registry.candidates(list[int]) == [MoneyList]
+
+        register_node_type(MoneyList, priority=1)
+        try:
+            assert get_type_tree(Money) == MoneyList(MoneyNode())
+        finally:
+            type_registry.unregister(MoneyList)